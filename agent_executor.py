@@ -7,152 +7,300 @@ This executor:
 3. Routes to appropriate Dynatrace agent skills
 4. Returns formatted responses
 """
+import abc
+import functools
 import re
+import uuid
+from collections import Counter
+from typing import Awaitable, Callable
+import httpx
 from a2a.server.agent_execution import AgentExecutor, RequestContext
 from a2a.server.events import EventQueue
+from a2a.types import Message
 from a2a.utils import new_agent_text_message
 
 from dynatrace_agent import DynatraceAgent
 
 
-class DynatraceAgentExecutor(AgentExecutor):
+# =============================================================================
+# Intent patterns - compiled once at import time
+#
+# All patterns are written in lowercase and run against the lowercased
+# query, so none of them needs re.IGNORECASE.
+# =============================================================================
+
+def _combine(*patterns: str) -> re.Pattern:
+    """Join alternative patterns into one regex so a family is a single scan."""
+    return re.compile("|".join(f"(?:{p})" for p in patterns))
+
+
+# Intent: Get Open Problems
+# Examples: "show problems", "list open issues", "what's wrong"
+_PROBLEM_RE = _combine(
+    r"(?:show|list|get|what are|any)\s*(?:the\s*)?(?:open\s*)?problems?",
+    r"what(?:'s| is) wrong",
+    r"any\s*(?:open\s*)?issues?",
+    r"current\s*(?:problems?|issues?|alerts?)",
+    r"(?:show|list)\s*alerts?",
+)
+
+# Intent: Analyze Specific Problem
+# Examples: "analyze P-123", "root cause for P-456", "investigate problem P-789"
+# Each alternative captures only the problem ID; the ID used is still the
+# first one in the query (see _problem_id_params).
+_ANALYZE_RE = _combine(
+    r"(?:analyze|investigate|root\s*cause|details?\s*(?:for|of|about)?|explain)\s*(?:problem\s*)?[\"']?(p-\d+)[\"']?",
+    r"(?:what(?:'s| is)\s*(?:causing|wrong\s*with))\s*(?:problem\s*)?[\"']?(p-\d+)[\"']?",
+    r"[\"']?(p-\d+)[\"']?\s*(?:analysis|details?|root\s*cause)",
+)
+
+# Intent: Get Service Topology
+# Examples: "topology for OrderService", "dependencies of payment-service"
+# Kept as an ordered tuple: the alternatives capture different service
+# names for the same query, so pattern order (not match position) decides.
+_TOPOLOGY_PATTERNS = tuple(re.compile(p) for p in (
+    r"(?:topology|dependencies|dependency|architecture|map)\s*(?:for|of)?\s*[\"']?([a-zA-Z0-9_\-\.]+)[\"']?",
+    r"(?:what\s*(?:does|services?))\s*[\"']?([a-zA-Z0-9_\-\.]+)[\"']?\s*(?:call|depend|connect)",
+    r"[\"']?([a-zA-Z0-9_\-\.]+)[\"']?\s*(?:topology|dependencies|architecture)",
+))
+
+# Intent: Get Entity Health
+# Examples: "health of HOST-123", "status of SERVICE-456"
+# An ordered tuple like topology: with several entity IDs in a query the
+# alternatives capture different ones, and the first pattern must win.
+_HEALTH_PATTERNS = tuple(re.compile(p) for p in (
+    r"(?:health|status|metrics?|check)\s*(?:for|of)?\s*[\"']?((?:host|service|process|application)-[a-z0-9]+)[\"']?",
+    r"[\"']?((?:host|service|process|application)-[a-z0-9]+)[\"']?\s*(?:health|status|metrics?)",
+    r"how\s*is\s*[\"']?((?:host|service|process|application)-[a-z0-9]+)[\"']?",
+))
+
+# Intent: Create ServiceNow Incident Summary
+# Examples: "create incident for P-123", "servicenow summary P-456"
+# As with analyze, the problem ID is the first one in the query.
+_INCIDENT_RE = _combine(
+    r"(?:create|generate|make)\s*(?:servicenow\s*)?incident\s*(?:for|from)?\s*[\"']?(p-\d+)[\"']?",
+    r"(?:servicenow|snow)\s*(?:summary|incident)\s*(?:for)?\s*[\"']?(p-\d+)[\"']?",
+    r"[\"']?(p-\d+)[\"']?\s*(?:servicenow|snow|incident)",
+)
+
+# Cheap substring prefilter: every pattern in a family contains at least
+# one of these fragments, so a family without a hit can skip its regex.
+_INTENT_TRIGGERS = {
+    "get_problems": ("problem", "issue", "alert", "wrong"),
+    "analyze_problem": ("p-",),
+    "get_topology": ("topology", "depend", "architecture", "map", "call", "connect"),
+    "get_health": ("host-", "service-", "process-", "application-"),
+    "create_incident": ("incident", "snow", "servicenow"),
+}
+
+
+def _triggered(query_lower: str, skill: str) -> bool:
+    """Return True if the query contains any trigger fragment for a skill."""
+    return any(trigger in query_lower for trigger in _INTENT_TRIGGERS[skill])
+
+
+_TIME_RE = re.compile(r"(?:last|past)\s*(\d+)\s*(h|hour|d|day|w|week)")
+_BARE_PID_RE = re.compile(r"^p-\d+$")
+_PROBLEM_ID_RE = re.compile(r"p-\d+")
+
+
+# =============================================================================
+# Parameter extractors - turn an intent match into (key, value) pairs
+# =============================================================================
+
+def _time_range_params(match: re.Match, query_lower: str, stripped: str) -> tuple:
+    """Extract the look-back window ("last 7 days" -> "7d"), default 24h."""
+    time_match = _TIME_RE.search(query_lower)
+    if time_match:
+        num = time_match.group(1)
+        unit = time_match.group(2)[0]  # First char: h, d, or w
+        return (("time_range", f"{num}{unit}"),)
+    return (("time_range", "24h"),)
+
+
+def _problem_id_params(match: re.Match, query_lower: str, stripped: str) -> tuple:
+    """Extract the first problem ID in the query."""
+    # Usually the matched phrase holds the first ID; only rescan the
+    # query when something ID-like comes before it.
+    start = match.start(match.lastindex)
+    if query_lower.find("p-", 0, start) == -1:
+        return (("problem_id", match.group(match.lastindex).upper()),)
+    return (("problem_id", _PROBLEM_ID_RE.search(query_lower).group(0).upper()),)
+
+
+def _entity_id_params(match: re.Match, query_lower: str, stripped: str) -> tuple:
+    """Extract the entity ID captured by the matched pattern."""
+    return (("entity_id", match.group(1).upper()),)
+
+
+def _service_name_params(match: re.Match, query_lower: str, stripped: str) -> tuple:
+    """Extract the service name with its original capitalization."""
+    service_name = match.group(1)
+    # Offsets only line up when lower() kept the length;
+    # some non-ASCII characters lowercase to two code points.
+    if len(query_lower) == len(stripped):
+        idx = query_lower.find(service_name)
+        return (("service_name", stripped[idx:idx + len(service_name)]),)
+    orig_match = re.search(re.escape(service_name), stripped, re.IGNORECASE)
+    if orig_match:
+        return (("service_name", orig_match.group(0)),)
+    return (("service_name", service_name),)
+
+
+# Intent table, tried in order; the first matching entry wins. The order is
+# also precedence for queries that hit several families (e.g. topology is
+# checked before health so "dependencies of SERVICE-1" routes to topology),
+# so reorder by hit rate (see BaseA2AExecutor.intent_counts) only where the
+# families cannot overlap. Bare problem IDs and empty queries are handled
+# before this table is consulted.
+_INTENTS: tuple[tuple[str, re.Pattern, Callable[[re.Match, str, str], tuple]], ...] = (
+    ("get_problems", _PROBLEM_RE, _time_range_params),
+    ("analyze_problem", _ANALYZE_RE, _problem_id_params),
+    *(("get_topology", pattern, _service_name_params) for pattern in _TOPOLOGY_PATTERNS),
+    *(("get_health", pattern, _entity_id_params) for pattern in _HEALTH_PATTERNS),
+    ("create_incident", _INCIDENT_RE, _problem_id_params),
+)
+
+
+# Shared result for the natural-language fallback, which needs no params
+_DEFAULT_INTENT = ("query", ())
+
+
+@functools.lru_cache(maxsize=1024)
+def _parse_intent_cached(query: str) -> tuple[str, tuple]:
     """
-    A2A Agent Executor for the Dynatrace AI Agent.
+    Parse a query into (skill_name, parameter items).
     
-    Routes incoming A2A messages to the appropriate Dynatrace agent skills:
-    - get_problems: List open problems
-    - analyze_problem: Root cause analysis
-    - get_topology: Service dependencies
-    - get_health: Entity health check
-    - create_incident: ServiceNow summary
-    - query: Natural language questions
+    Parameters are returned as a tuple of (key, value) pairs so the result
+    is hashable and can be memoized; repeated queries skip the regex work.
+    """
+    stripped = query.strip()
+    query_lower = stripped.lower()
+    
+    # A bare problem ID ("P-12345") is common; the two-character prefix
+    # check keeps the regex off the path for every other query.
+    if query_lower[:2] == "p-" and _BARE_PID_RE.match(query_lower):
+        return ("analyze_problem", (("problem_id", query_lower.upper()),))
+    
+    for skill, pattern, extract in _INTENTS:
+        if _triggered(query_lower, skill):
+            match = pattern.search(query_lower)
+            if match:
+                return (skill, extract(match, query_lower, stripped))
+    
+    # Default: Natural Language Query (the handler uses the raw query)
+    return _DEFAULT_INTENT
+
+
+_HELP_MESSAGE = """# 🔷 Dynatrace AI Agent
+
+I'm your AI-powered observability assistant for Dynatrace! Here's what I can do:
+
+## 📋 Available Commands
+
+### 🚨 Get Problems
+View open problems detected by Davis AI:
+- "Show open problems"
+- "List issues from the last 7 days"
+- "Any current alerts?"
+
+### 🔍 Analyze Problem (Root Cause)
+Deep-dive into a specific problem:
+- "Analyze P-12345678"
+- "Root cause for P-87654321"
+- "Investigate problem P-11111111"
+
+### 🌐 Service Topology
+View service dependencies:
+- "Topology for OrderService"
+- "Dependencies of payment-service"
+- "What does checkout-api call?"
+
+### 🏥 Entity Health
+Check health of a specific entity:
+- "Health of HOST-ABC123"
+- "Status of SERVICE-XYZ789"
+- "Metrics for PROCESS-DEF456"
+
+### 📋 ServiceNow Integration
+Create incident summary for ServiceNow:
+- "Create incident for P-12345678"
+- "ServiceNow summary P-87654321"
+
+### 💬 Natural Language
+Ask any question about your environment:
+- "What services are affected by the current issues?"
+- "Are there any database-related problems?"
+- "How many hosts are monitored?"
+
+---
+**Tip:** Provide a Problem ID (like `P-12345678`) for detailed analysis!
+"""
+
+
+# Skill dispatch: skill name -> (DynatraceAgent method, parsed parameter
+# passed to it). None means the method takes the raw query text.
+_SKILLS: dict[str, tuple[str, str | None]] = {
+    "get_problems": ("get_open_problems", "time_range"),
+    "analyze_problem": ("analyze_problem", "problem_id"),
+    "get_topology": ("get_service_topology", "service_name"),
+    "get_health": ("get_entity_health", "entity_id"),
+    "create_incident": ("create_incident_summary", "problem_id"),
+    "query": ("query", None),
+}
+
+
+class BaseA2AExecutor(AgentExecutor):
+    """
+    Shared A2A executor scaffolding.
+    
+    Handles text extraction, the empty-query help reply, error wrapping
+    and cancellation. Subclasses implement:
+    - _parse_intent: map the user's text to (skill_name, parameters)
+    - _dispatch: run a skill and return its text response
+    - _get_help_message: reply for empty queries
+    
+    intent_counts tallies how often each skill is selected, which is the
+    data needed to tune the order of the intent table. The server reports
+    it at /metrics/intents.
     """
     
     def __init__(self):
-        self.agent = DynatraceAgent()
+        self.intent_counts: Counter[str] = Counter()
+        self._help_template = new_agent_text_message(self._get_help_message())
     
     def _extract_query(self, context: RequestContext) -> str:
         """Extract the user's text message from the A2A request."""
         message = context.message
         if message and message.parts:
             for part in message.parts:
-                if hasattr(part, 'text') and part.text:
-                    return part.text
+                # a2a Part is a RootModel wrapping TextPart/FilePart/DataPart
+                text = getattr(getattr(part, 'root', part), 'text', None)
+                if text:
+                    return text
         return ""
     
-    def _parse_intent(self, query: str) -> tuple[str, dict]:
+    @abc.abstractmethod
+    def _parse_intent(self, query: str) -> tuple[str, dict | None]:
+        """Parse user query into (skill_name, parameters)."""
+    
+    @abc.abstractmethod
+    async def _dispatch(self, skill: str, params: dict | None, query: str) -> str:
+        """Run the given skill and return its text response."""
+    
+    @abc.abstractmethod
+    def _get_help_message(self) -> str:
+        """Return help message explaining available capabilities."""
+    
+    def _help_event(self) -> Message:
         """
-        Parse user query to determine which skill to invoke.
+        Return the help reply as an agent message.
         
-        Returns:
-            tuple: (skill_name, parameters)
+        The message is built once, in __init__, and then shallow-copied
+        with a fresh message_id per request, since A2A message IDs must be
+        unique.
         """
-        query_lower = query.lower().strip()
-        
-        # =====================================================================
-        # Intent: Get Open Problems
-        # Examples: "show problems", "list open issues", "what's wrong"
-        # =====================================================================
-        problem_patterns = [
-            r"(?:show|list|get|what are|any)\s*(?:the\s*)?(?:open\s*)?problems?",
-            r"what(?:'s| is) wrong",
-            r"any\s*(?:open\s*)?issues?",
-            r"current\s*(?:problems?|issues?|alerts?)",
-            r"(?:show|list)\s*alerts?",
-        ]
-        
-        for pattern in problem_patterns:
-            if re.search(pattern, query_lower):
-                # Check for time range
-                time_match = re.search(r"(?:last|past)\s*(\d+)\s*(h|hour|d|day|w|week)", query_lower)
-                if time_match:
-                    num = time_match.group(1)
-                    unit = time_match.group(2)[0]  # First char: h, d, or w
-                    time_range = f"{num}{unit}"
-                else:
-                    time_range = "24h"
-                
-                return ("get_problems", {"time_range": time_range})
-        
-        # =====================================================================
-        # Intent: Analyze Specific Problem
-        # Examples: "analyze P-123", "root cause for P-456", "investigate problem P-789"
-        # =====================================================================
-        analyze_patterns = [
-            r"(?:analyze|investigate|root\s*cause|details?\s*(?:for|of|about)?|explain)\s*(?:problem\s*)?[\"']?(P-\d+)[\"']?",
-            r"(?:what(?:'s| is)\s*(?:causing|wrong\s*with))\s*(?:problem\s*)?[\"']?(P-\d+)[\"']?",
-            r"[\"']?(P-\d+)[\"']?\s*(?:analysis|details?|root\s*cause)",
-        ]
-        
-        for pattern in analyze_patterns:
-            match = re.search(pattern, query_lower, re.IGNORECASE)
-            if match:
-                # Try to find problem ID in original query (preserve case)
-                problem_id_match = re.search(r"(P-\d+)", query, re.IGNORECASE)
-                if problem_id_match:
-                    return ("analyze_problem", {"problem_id": problem_id_match.group(1).upper()})
-        
-        # Also match just a problem ID by itself
-        if re.match(r"^P-\d+$", query.strip(), re.IGNORECASE):
-            return ("analyze_problem", {"problem_id": query.strip().upper()})
-        
-        # =====================================================================
-        # Intent: Get Service Topology
-        # Examples: "topology for OrderService", "dependencies of payment-service"
-        # =====================================================================
-        topology_patterns = [
-            r"(?:topology|dependencies|dependency|architecture|map)\s*(?:for|of)?\s*[\"']?([a-zA-Z0-9_\-\.]+)[\"']?",
-            r"(?:what\s*(?:does|services?))\s*[\"']?([a-zA-Z0-9_\-\.]+)[\"']?\s*(?:call|depend|connect)",
-            r"[\"']?([a-zA-Z0-9_\-\.]+)[\"']?\s*(?:topology|dependencies|architecture)",
-        ]
-        
-        for pattern in topology_patterns:
-            match = re.search(pattern, query_lower)
-            if match:
-                service_name = match.group(1)
-                # Find the actual service name from original query
-                orig_match = re.search(rf"[\"']?({re.escape(service_name)})[\"']?", query, re.IGNORECASE)
-                if orig_match:
-                    return ("get_topology", {"service_name": orig_match.group(1)})
-                return ("get_topology", {"service_name": service_name})
-        
-        # =====================================================================
-        # Intent: Get Entity Health
-        # Examples: "health of HOST-123", "status of SERVICE-456"
-        # =====================================================================
-        health_patterns = [
-            r"(?:health|status|metrics?|check)\s*(?:for|of)?\s*[\"']?((?:HOST|SERVICE|PROCESS|APPLICATION)-[A-Z0-9]+)[\"']?",
-            r"[\"']?((?:HOST|SERVICE|PROCESS|APPLICATION)-[A-Z0-9]+)[\"']?\s*(?:health|status|metrics?)",
-            r"how\s*is\s*[\"']?((?:HOST|SERVICE|PROCESS|APPLICATION)-[A-Z0-9]+)[\"']?",
-        ]
-        
-        for pattern in health_patterns:
-            match = re.search(pattern, query, re.IGNORECASE)
-            if match:
-                return ("get_health", {"entity_id": match.group(1).upper()})
-        
-        # =====================================================================
-        # Intent: Create ServiceNow Incident Summary
-        # Examples: "create incident for P-123", "servicenow summary P-456"
-        # =====================================================================
-        incident_patterns = [
-            r"(?:create|generate|make)\s*(?:servicenow\s*)?incident\s*(?:for|from)?\s*[\"']?(P-\d+)[\"']?",
-            r"(?:servicenow|snow)\s*(?:summary|incident)\s*(?:for)?\s*[\"']?(P-\d+)[\"']?",
-            r"[\"']?(P-\d+)[\"']?\s*(?:servicenow|snow|incident)",
-        ]
-        
-        for pattern in incident_patterns:
-            match = re.search(pattern, query_lower, re.IGNORECASE)
-            if match:
-                # Find problem ID in original query
-                problem_id_match = re.search(r"(P-\d+)", query, re.IGNORECASE)
-                if problem_id_match:
-                    return ("create_incident", {"problem_id": problem_id_match.group(1).upper()})
-        
-        # =====================================================================
-        # Default: Natural Language Query
-        # =====================================================================
-        return ("query", {"question": query})
+        return self._help_template.model_copy(update={"message_id": str(uuid.uuid4())})
     
     async def execute(
         self,
@@ -162,53 +310,24 @@ class DynatraceAgentExecutor(AgentExecutor):
         """
         Handle incoming A2A requests.
         
-        Routes the request to the appropriate Dynatrace agent skill
-        based on the parsed intent.
+        Routes the request to the skill selected by _parse_intent.
         """
         query = self._extract_query(context)
         
         # Handle empty queries
         if not query:
-            response = self._get_help_message()
-            await event_queue.enqueue_event(new_agent_text_message(response))
+            await event_queue.enqueue_event(self._help_event())
             return
         
         # Parse intent and get parameters
         skill, params = self._parse_intent(query)
+        self.intent_counts[skill] += 1
         
-        # Route to appropriate skill
+        # Only errors a skill is expected to raise become a chat reply;
+        # anything else (including cancellation) propagates to the server.
         try:
-            if skill == "get_problems":
-                response = await self.agent.get_open_problems(
-                    time_range=params.get("time_range", "24h")
-                )
-            
-            elif skill == "analyze_problem":
-                response = await self.agent.analyze_problem(
-                    problem_id=params["problem_id"]
-                )
-            
-            elif skill == "get_topology":
-                response = await self.agent.get_service_topology(
-                    service_name=params["service_name"]
-                )
-            
-            elif skill == "get_health":
-                response = await self.agent.get_entity_health(
-                    entity_id=params["entity_id"]
-                )
-            
-            elif skill == "create_incident":
-                response = await self.agent.create_incident_summary(
-                    problem_id=params["problem_id"]
-                )
-            
-            else:  # query (natural language)
-                response = await self.agent.query(
-                    question=params.get("question", query)
-                )
-        
-        except Exception as e:
+            response = await self._dispatch(skill, params, query)
+        except (httpx.HTTPError, ValueError, KeyError) as e:
             response = f"❌ Error executing {skill}: {str(e)}"
         
         # Send response
@@ -223,50 +342,55 @@ class DynatraceAgentExecutor(AgentExecutor):
         await event_queue.enqueue_event(
             new_agent_text_message("Task cancelled.")
         )
+
+
+class DynatraceAgentExecutor(BaseA2AExecutor):
+    """
+    A2A Agent Executor for the Dynatrace AI Agent.
+    
+    Routes incoming A2A messages to the appropriate Dynatrace agent skills:
+    - get_problems: List open problems
+    - analyze_problem: Root cause analysis
+    - get_topology: Service dependencies
+    - get_health: Entity health check
+    - create_incident: ServiceNow summary
+    - query: Natural language questions
+    """
+    
+    def __init__(self):
+        super().__init__()
+        self.agent = DynatraceAgent()
+        self._handlers = {skill: self._make_handler(skill) for skill in _SKILLS}
+    
+    def _parse_intent(self, query: str) -> tuple[str, dict | None]:
+        """
+        Parse user query to determine which skill to invoke.
+        
+        Returns:
+            tuple: (skill_name, parameters), parameters is None for the
+            natural-language query skill, which works on the raw query
+        """
+        skill, params = _parse_intent_cached(query)
+        return (skill, dict(params) if params else None)
+    
+    def _make_handler(self, skill: str) -> Callable[[dict | None, str], Awaitable[str]]:
+        """Bind a skill to its agent method once, at construction time."""
+        method_name, param = _SKILLS[skill]
+        method = getattr(self.agent, method_name)
+        
+        if param is None:
+            async def handler(params: dict | None, query: str) -> str:
+                return await method(query)
+        else:
+            async def handler(params: dict, query: str) -> str:
+                return await method(params[param])
+        
+        return handler
+    
+    async def _dispatch(self, skill: str, params: dict | None, query: str) -> str:
+        """Route a parsed intent to the matching Dynatrace agent skill."""
+        return await self._handlers[skill](params, query)
     
     def _get_help_message(self) -> str:
         """Return help message explaining available capabilities."""
-        return """# 🔷 Dynatrace AI Agent
-
-I'm your AI-powered observability assistant for Dynatrace! Here's what I can do:
-
-## 📋 Available Commands
-
-### 🚨 Get Problems
-View open problems detected by Davis AI:
-- "Show open problems"
-- "List issues from the last 7 days"
-- "Any current alerts?"
-
-### 🔍 Analyze Problem (Root Cause)
-Deep-dive into a specific problem:
-- "Analyze P-12345678"
-- "Root cause for P-87654321"
-- "Investigate problem P-11111111"
-
-### 🌐 Service Topology
-View service dependencies:
-- "Topology for OrderService"
-- "Dependencies of payment-service"
-- "What does checkout-api call?"
-
-### 🏥 Entity Health
-Check health of a specific entity:
-- "Health of HOST-ABC123"
-- "Status of SERVICE-XYZ789"
-- "Metrics for PROCESS-DEF456"
-
-### 📋 ServiceNow Integration
-Create incident summary for ServiceNow:
-- "Create incident for P-12345678"
-- "ServiceNow summary P-87654321"
-
-### 💬 Natural Language
-Ask any question about your environment:
-- "What services are affected by the current issues?"
-- "Are there any database-related problems?"
-- "How many hosts are monitored?"
-
----
-**Tip:** Provide a Problem ID (like `P-12345678`) for detailed analysis!
-"""
+        return _HELP_MESSAGE
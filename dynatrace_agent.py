@@ -8,13 +8,112 @@ This agent provides:
 4. Impact Assessment
 5. Remediation Suggestions
 """
-import os
+import asyncio
+import functools
+import hashlib
+import io
 import json
+import logging
+import re
 from datetime import datetime
-from typing import Any
-from google import genai
+from itertools import islice
+from typing import Any, AsyncIterator, Awaitable, Callable
+from cachetools import TTLCache
 
-from dynatrace_client import DynatraceClient
+try:
+    import orjson
+except ImportError:  # Optional; _pretty_json falls back to the json module
+    orjson = None
+
+from dynatrace_client import DynatraceClient, entity_id_selector
+from settings import Settings, get_settings
+
+logger = logging.getLogger(__name__)
+
+# Words of a lowercased natural-language question
+_WORD_RE = re.compile(r"[a-z]+")
+
+
+def _pretty_json(obj: Any) -> str:
+    """Serialize obj as 2-space indented JSON, with orjson when available."""
+    if orjson is not None:
+        return orjson.dumps(obj, option=orjson.OPT_INDENT_2).decode()
+    return json.dumps(obj, indent=2, ensure_ascii=False)
+
+
+@functools.lru_cache(maxsize=1024)
+def _fmt_ts_minute(ts_ms: int) -> str:
+    """
+    Format a minute-aligned epoch-millis timestamp as local 'YYYY-MM-DD HH:MM'.
+    
+    Callers round down to the minute first so events from the same minute
+    (e.g. a mass deployment) share one cache entry.
+    """
+    return datetime.fromtimestamp(ts_ms / 1000).strftime("%Y-%m-%d %H:%M")
+
+
+@functools.lru_cache(maxsize=4)
+def _get_genai_client(api_key: str):
+    """
+    Gemini client for api_key, shared by every agent using that key.
+    
+    The client pools its HTTP connections, so agents created per request
+    or per executor reuse them instead of each setting up their own.
+    """
+    from google import genai
+    return genai.Client(api_key=api_key)
+
+
+# Prefix of the text returned in place of an answer when Gemini fails
+_AI_UNAVAILABLE = "AI analysis unavailable"
+
+
+# Gemini prompt templates, filled with str.format. Keeping the fixed text
+# stable also keeps AI response cache keys stable between calls.
+_ANALYZE_PROMPT = """You are an expert SRE/DevOps engineer analyzing a Dynatrace problem.
+
+**Problem Context:**
+{context}
+
+Based on this data, provide:
+
+1. **Root Cause Determination**: What is the most likely root cause based on the evidence?
+
+2. **Correlation Analysis**: Are there any correlations between the evidence (e.g., deployment before the issue, metric anomalies)?
+
+3. **Impact Assessment**: How severe is this issue and what is affected?
+
+4. **Recommended Remediation**: What specific actions should the ops team take?
+
+5. **Prevention**: How can this be prevented in the future?
+
+Be specific and actionable. Reference the actual evidence provided."""
+
+_SUMMARY_PROMPT = """Summarize this IT incident in 2-3 sentences for a ServiceNow ticket:
+            
+Problem: {title}
+Severity: {severity}
+Root Cause Entity: {root_cause_name} ({root_cause_type})
+Evidence: {evidence}
+
+Be concise and technical."""
+
+_QUERY_PROMPT = """You are a Dynatrace expert assistant. Answer the following question based on the environment data provided.
+
+**Question:** {question}
+
+**Available Environment Data:**
+{context}
+
+Provide a helpful, specific answer. If the data doesn't contain enough information, explain what additional queries might help."""
+
+# For questions that pulled in no environment data (greetings, general
+# how-to questions), so they don't pay for the full data-answering prompt
+_GENERAL_PROMPT = """You are a Dynatrace expert assistant. Briefly answer the following question with general guidance.
+
+**Question:** {question}
+
+If it is about this specific environment, suggest asking about open problems, services, hosts, or a specific entity ID."""
 
 
 class DynatraceAgent:
@@ -30,28 +129,189 @@ class DynatraceAgent:
     
     SUPPORTED_CONTENT_TYPES = ["text", "text/plain"]
     
-    def __init__(self):
+    # Question words that pull each kind of environment data into query()
+    _PROBLEM_KEYWORDS = frozenset({
+        "problem", "problems", "issue", "issues",
+        "alert", "alerts", "incident", "incidents",
+    })
+    _SERVICE_KEYWORDS = frozenset({"service", "services", "application", "applications"})
+    _HOST_KEYWORDS = frozenset({"host", "hosts", "server", "servers", "infrastructure"})
+    
+    def __init__(self, settings: Settings | None = None):
         """Initialize Dynatrace client and Gemini AI."""
-        self.dynatrace = DynatraceClient()
+        settings = settings or get_settings()
+        self.dynatrace = DynatraceClient(settings)
         
         # Initialize Gemini for AI analysis
-        api_key = os.getenv("GEMINI_API_KEY")
+        api_key = settings.gemini_api_key
         if not api_key:
             raise ValueError("GEMINI_API_KEY environment variable is required")
         
-        self.genai_client = genai.Client(api_key=api_key)
+        # The google-genai import chain is heavy, so the client is only
+        # created on first use (see genai_client)
+        self._gemini_api_key = api_key
+        self._genai_client = None
         self.model = "gemini-2.0-flash"
+        
+        # Short-lived caches so repeated questions don't re-fetch the same
+        # Dynatrace data. Entity lists change more slowly than problems.
+        cache_ttl = settings.dynatrace_cache_ttl
+        self._problems_cache = TTLCache(maxsize=128, ttl=cache_ttl)
+        self._entities_cache = TTLCache(maxsize=256, ttl=cache_ttl * 2)
+        
+        # Full problem details, shared by analyze_problem and a follow-up
+        # create_incident_summary for the same problem
+        self._problem_cache = TTLCache(maxsize=128, ttl=60)
+        
+        # Service name -> entity ID, as resolved by get_service_topology
+        self._name_to_id = TTLCache(maxsize=512, ttl=300)
+        
+        # Gemini answers by model + prompt, so repeated questions about
+        # unchanged data don't pay for another round trip
+        self._ai_cache = TTLCache(
+            maxsize=512,
+            ttl=settings.gemini_cache_ttl,
+        )
+    
+    async def aclose(self) -> None:
+        """Release the Dynatrace client's pooled connections."""
+        await self.dynatrace.aclose()
+    
+    @property
+    def genai_client(self):
+        """Gemini client, imported and created on first use."""
+        if self._genai_client is None:
+            self._genai_client = _get_genai_client(self._gemini_api_key)
+        return self._genai_client
+    
+    async def _cached(
+        self,
+        cache: TTLCache,
+        key: tuple,
+        fetch: Callable[[], Awaitable[Any]],
+    ) -> Any:
+        """Return cache[key], awaiting fetch() and storing its result on a miss."""
+        try:
+            return cache[key]
+        except KeyError:
+            pass
+        value = await fetch()
+        cache[key] = value
+        return value
+    
+    async def _get_problems_cached(self, **kwargs) -> dict[str, Any]:
+        """DynatraceClient.get_problems behind the problems TTL cache."""
+        return await self._cached(
+            self._problems_cache,
+            tuple(sorted(kwargs.items())),
+            lambda: self.dynatrace.get_problems(**kwargs),
+        )
+    
+    async def _get_entities_cached(self, **kwargs) -> dict[str, Any]:
+        """DynatraceClient.get_entities behind the entities TTL cache."""
+        return await self._cached(
+            self._entities_cache,
+            tuple(sorted(kwargs.items())),
+            lambda: self.dynatrace.get_entities(**kwargs),
+        )
+    
+    async def _get_problem_cached(self, problem_id: str) -> dict[str, Any]:
+        """
+        DynatraceClient.get_problem_details behind the problem TTL cache.
+        
+        Concurrent misses for the same problem share one request through
+        the client's GET single-flight.
+        """
+        return await self._cached(
+            self._problem_cache,
+            problem_id,
+            lambda: self.dynatrace.get_problem_details(problem_id),
+        )
+    
+    def _ai_cache_key(self, prompt: str) -> str:
+        """Key for the AI response cache; includes the model name."""
+        return hashlib.blake2b(
+            f"{self.model}\0{prompt}".encode(), digest_size=16
+        ).hexdigest()
     
     async def _ai_analyze(self, prompt: str) -> str:
         """Use Gemini to analyze data and generate insights."""
+        key = self._ai_cache_key(prompt)
         try:
-            response = self.genai_client.models.generate_content(
+            return self._ai_cache[key]
+        except KeyError:
+            pass
+        
+        try:
+            response = await self.genai_client.aio.models.generate_content(
+                model=self.model,
+                contents=prompt
+            )
+            text = response.text.strip()
+        except Exception as e:
+            return f"{_AI_UNAVAILABLE}: {str(e)}"
+        
+        self._ai_cache[key] = text
+        return text
+    
+    async def _ai_analyze_stream(self, prompt: str) -> AsyncIterator[str]:
+        """
+        Stream Gemini's answer to a prompt as it is generated.
+        
+        The chunks join to exactly what _ai_analyze would return, and the
+        complete answer is added to the AI response cache at the end.
+        """
+        key = self._ai_cache_key(prompt)
+        cached = self._ai_cache.get(key)
+        if cached is not None:
+            yield cached
+            return
+        
+        parts = []
+        pending = ""  # Trailing whitespace, held back until more text follows
+        try:
+            stream = await self.genai_client.aio.models.generate_content_stream(
                 model=self.model,
                 contents=prompt
             )
-            return response.text.strip()
+            async for chunk in stream:
+                text = pending + (chunk.text or "")
+                if not parts:
+                    text = text.lstrip()
+                body = text.rstrip()
+                pending = text[len(body):]
+                if body:
+                    parts.append(body)
+                    yield body
         except Exception as e:
-            return f"AI analysis unavailable: {str(e)}"
+            separator = "\n\n" if parts else ""
+            yield f"{separator}{_AI_UNAVAILABLE}: {str(e)}"
+            return
+        
+        self._ai_cache[key] = "".join(parts)
+    
+    @staticmethod
+    async def _collect(stream: AsyncIterator[str]) -> str:
+        """Join a streamed response back into a single string."""
+        return "".join([chunk async for chunk in stream])
+    
+    @staticmethod
+    def _incident_summary_prompt(problem: dict[str, Any], descriptions: list[str]) -> str:
+        """
+        Build the AI prompt for the short ServiceNow incident summary.
+        
+        descriptions are the non-empty display names of the first five
+        evidence items.
+        """
+        root_cause = problem.get("rootCauseEntity", {})
+        
+        return _SUMMARY_PROMPT.format(
+            title=problem.get("title", "Unknown Problem"),
+            severity=problem.get("severityLevel", "UNKNOWN"),
+            root_cause_name=root_cause.get("name", "Unknown"),
+            root_cause_type=root_cause.get("entityId", {}).get("type", "Unknown"),
+            evidence=", ".join(descriptions),
+        )
     
     # =========================================================================
     # SKILL 1: Get Open Problems
@@ -69,7 +329,7 @@ class DynatraceAgent:
         """
         try:
             from_time = f"now-{time_range}"
-            result = await self.dynatrace.get_problems(
+            result = await self._get_problems_cached(
                 status="OPEN",
                 from_time=from_time,
             )
@@ -79,25 +339,28 @@ class DynatraceAgent:
             if not problems:
                 return f"✅ **No open problems** detected in the last {time_range}. Your environment is healthy!"
             
-            # Format the problems
-            output = [f"🚨 **{len(problems)} Open Problem(s)** detected in the last {time_range}:\n"]
+            # Format the problems. Every line after the first is written
+            # with a leading newline, so the text has no trailing one.
+            buf = io.StringIO()
+            w = buf.write
+            w(f"🚨 **{len(problems)} Open Problem(s)** detected in the last {time_range}:\n")
             
             for i, problem in enumerate(problems, 1):
-                output.append(f"\n**{i}. {problem.get('title', 'Unknown')}**")
-                output.append(f"   • Problem ID: `{problem.get('problemId', 'N/A')}`")
-                output.append(f"   • Severity: {problem.get('severityLevel', 'N/A')}")
-                output.append(f"   • Impact: {problem.get('impactLevel', 'N/A')}")
+                w(f"\n\n**{i}. {problem.get('title', 'Unknown')}**")
+                w(f"\n   • Problem ID: `{problem.get('problemId', 'N/A')}`")
+                w(f"\n   • Severity: {problem.get('severityLevel', 'N/A')}")
+                w(f"\n   • Impact: {problem.get('impactLevel', 'N/A')}")
                 
                 # Root cause entity
                 root_cause = problem.get("rootCauseEntity", {})
                 if root_cause:
-                    output.append(f"   • Root Cause: {root_cause.get('name', 'Unknown')}")
+                    w(f"\n   • Root Cause: {root_cause.get('name', 'Unknown')}")
                 
                 # Affected entities count
                 affected = problem.get("affectedEntities", [])
-                output.append(f"   • Affected Entities: {len(affected)}")
+                w(f"\n   • Affected Entities: {len(affected)}")
             
-            return "\n".join(output)
+            return buf.getvalue()
             
         except Exception as e:
             return f"❌ Error fetching problems: {str(e)}"
@@ -123,123 +386,141 @@ class DynatraceAgent:
         Returns:
             Comprehensive root cause analysis with recommendations
         """
+        return await self._collect(self.analyze_problem_stream(problem_id))
+    
+    async def analyze_problem_stream(self, problem_id: str) -> AsyncIterator[str]:
+        """
+        Streaming variant of analyze_problem.
+        
+        Yields the evidence and deployment sections as soon as the Dynatrace
+        data is in, then the AI analysis as Gemini generates it. The chunks
+        join to the same text analyze_problem returns.
+        """
         try:
-            # Step 1: Get problem details
-            problem = await self.dynatrace.get_problem_details(problem_id)
-            
-            title = problem.get("title", "Unknown Problem")
-            status = problem.get("status", "UNKNOWN")
-            severity = problem.get("severityLevel", "UNKNOWN")
-            
-            # Step 2: Extract evidence
-            evidence_details = problem.get("evidenceDetails", {})
-            evidence_list = evidence_details.get("details", [])
-            
-            # Step 3: Get affected entities
-            affected_entities = problem.get("affectedEntities", [])
-            root_cause_entity = problem.get("rootCauseEntity", {})
-            
-            # Step 4: Get impact analysis
-            impact_analysis = problem.get("impactAnalysis", {})
-            impacts = impact_analysis.get("impacts", [])
-            
-            # Step 5: Check for recent deployments near the root cause entity
-            deployments = []
-            if root_cause_entity:
-                entity_id = root_cause_entity.get("entityId", {}).get("id", "")
-                if entity_id:
-                    try:
-                        deploy_result = await self.dynatrace.get_recent_deployments(
-                            entity_selector=f'entityId("{entity_id}")',
-                            from_time="now-7d"
-                        )
-                        deployments = deploy_result.get("events", [])
-                    except:
-                        pass  # Deployments are optional context
-            
-            # Step 6: Build context for AI analysis
-            ai_context = {
-                "problem_title": title,
-                "severity": severity,
-                "root_cause_entity": root_cause_entity.get("name", "Unknown"),
-                "root_cause_entity_type": root_cause_entity.get("entityId", {}).get("type", "Unknown"),
-                "evidence": [
-                    {
-                        "type": e.get("evidenceType"),
-                        "name": e.get("displayName"),
-                        "is_root_cause": e.get("rootCauseRelevant", False)
-                    }
-                    for e in evidence_list[:10]  # Limit to top 10
-                ],
-                "affected_entities_count": len(affected_entities),
-                "impacted_users": sum(
-                    i.get("impactedUsers", 0) for i in impacts if isinstance(i.get("impactedUsers"), int)
-                ),
-                "recent_deployments": [
-                    {
-                        "title": d.get("title", "Unknown"),
-                        "timestamp": d.get("startTime", 0)
-                    }
-                    for d in deployments[:5]
-                ]
-            }
-            
-            # Step 7: AI-powered analysis
-            ai_prompt = f"""You are an expert SRE/DevOps engineer analyzing a Dynatrace problem.
-
-**Problem Context:**
-{json.dumps(ai_context, indent=2)}
-
-Based on this data, provide:
-
-1. **Root Cause Determination**: What is the most likely root cause based on the evidence?
-
-2. **Correlation Analysis**: Are there any correlations between the evidence (e.g., deployment before the issue, metric anomalies)?
-
-3. **Impact Assessment**: How severe is this issue and what is affected?
-
-4. **Recommended Remediation**: What specific actions should the ops team take?
-
-5. **Prevention**: How can this be prevented in the future?
-
-Be specific and actionable. Reference the actual evidence provided."""
-
-            ai_analysis = await self._ai_analyze(ai_prompt)
-            
-            # Step 8: Build the response
-            output = [
-                f"# 🔍 Root Cause Analysis: {title}",
-                f"\n**Problem ID:** `{problem_id}`",
-                f"**Status:** {status} | **Severity:** {severity}",
-                f"\n---\n",
-                f"## 📊 Evidence Summary\n",
-            ]
-            
-            # Add evidence
-            for evidence in evidence_list[:5]:
-                marker = "🔴" if evidence.get("rootCauseRelevant") else "⚪"
-                output.append(f"{marker} **{evidence.get('evidenceType', 'N/A')}**: {evidence.get('displayName', 'N/A')}")
-            
-            # Add deployment info if any
-            if deployments:
-                output.append(f"\n## 🚀 Recent Deployments\n")
-                for deploy in deployments[:3]:
-                    timestamp = deploy.get("startTime", 0)
-                    if timestamp:
-                        deploy_time = datetime.fromtimestamp(timestamp / 1000).strftime("%Y-%m-%d %H:%M")
-                    else:
-                        deploy_time = "Unknown"
-                    output.append(f"• {deploy.get('title', 'Unknown')} ({deploy_time})")
-            
-            # Add AI analysis
-            output.append(f"\n---\n")
-            output.append(f"## 🤖 AI-Powered Analysis\n")
-            output.append(ai_analysis)
-            
-            return "\n".join(output)
-            
+            header, ai_prompt = await self._prepare_analysis(problem_id)
         except Exception as e:
-            return f"❌ Error analyzing problem {problem_id}: {str(e)}"
+            yield f"❌ Error analyzing problem {problem_id}: {str(e)}"
+            return
+        
+        yield header + "\n"
+        async for chunk in self._ai_analyze_stream(ai_prompt):
+            yield chunk
+    
+    async def _prepare_analysis(self, problem_id: str) -> tuple[str, str]:
+        """
+        Gather everything analyze_problem needs before the AI step.
+        
+        Returns:
+            The response text up to the AI section heading, and the AI
+            prompt.
+        """
+        # Step 1: Get problem details
+        problem = await self._get_problem_cached(problem_id)
+        
+        title = problem.get("title", "Unknown Problem")
+        status = problem.get("status", "UNKNOWN")
+        severity = problem.get("severityLevel", "UNKNOWN")
+        
+        # Step 2: Extract evidence. One pass builds both the AI context
+        # entries (top 10) and the response lines (top 5).
+        evidence_details = problem.get("evidenceDetails", {})
+        evidence_context = []
+        evidence_lines = []
+        for idx, e in enumerate(islice(evidence_details.get("details", ()), 10)):
+            is_root_cause = e.get("rootCauseRelevant", False)
+            evidence_context.append({
+                "type": e.get("evidenceType"),
+                "name": e.get("displayName"),
+                "is_root_cause": is_root_cause
+            })
+            if idx < 5:
+                marker = "🔴" if is_root_cause else "⚪"
+                evidence_lines.append(
+                    f"\n{marker} **{e.get('evidenceType', 'N/A')}**: {e.get('displayName', 'N/A')}"
+                )
+        
+        # Step 3: Get affected entities
+        affected_entities = problem.get("affectedEntities", [])
+        root_cause_entity = problem.get("rootCauseEntity", {})
+        
+        # Step 4: Get impact analysis
+        impact_analysis = problem.get("impactAnalysis", {})
+        impacts = impact_analysis.get("impacts", [])
+        impacted_users = 0
+        for impact in impacts:
+            users = impact.get("impactedUsers", 0)
+            if type(users) is int:  # Skip missing/non-numeric counts
+                impacted_users += users
+        
+        # Step 5: Fetch optional context around the root cause entity.
+        # Sources are gathered concurrently; failures come back as
+        # results instead of raising, so one missing source does not
+        # abort the analysis.
+        optional_fetches = {}
+        entity_id = root_cause_entity.get("entityId", {}).get("id", "") if root_cause_entity else ""
+        if entity_id:
+            optional_fetches["deployments"] = self.dynatrace.get_recent_deployments(
+                entity_selector=entity_id_selector(entity_id),
+                from_time="now-7d"
+            )
+        
+        optional_results = dict(zip(
+            optional_fetches,
+            await asyncio.gather(*optional_fetches.values(), return_exceptions=True),
+        ))
+        
+        deploy_result = optional_results.get("deployments")
+        deployments = deploy_result.get("events", []) if isinstance(deploy_result, dict) else []
+        
+        # Step 6: Build context for AI analysis
+        ai_context = {
+            "problem_title": title,
+            "severity": severity,
+            "root_cause_entity": root_cause_entity.get("name", "Unknown"),
+            "root_cause_entity_type": root_cause_entity.get("entityId", {}).get("type", "Unknown"),
+            "evidence": evidence_context,
+            "affected_entities_count": len(affected_entities),
+            "impacted_users": impacted_users,
+            "recent_deployments": [
+                {
+                    "title": d.get("title", "Unknown"),
+                    "timestamp": d.get("startTime", 0)
+                }
+                for d in islice(deployments, 5)
+            ]
+        }
+        
+        # Step 7: AI-powered analysis
+        ai_prompt = _ANALYZE_PROMPT.format(context=_pretty_json(ai_context))
+
+        # Step 8: Build the response up to the AI section
+        buf = io.StringIO()
+        w = buf.write
+        w(f"# 🔍 Root Cause Analysis: {title}")
+        w(f"\n\n**Problem ID:** `{problem_id}`")
+        w(f"\n**Status:** {status} | **Severity:** {severity}")
+        w("\n\n---\n")
+        w("\n## 📊 Evidence Summary\n")
+        
+        # Add evidence
+        w("".join(evidence_lines))
+        
+        # Add deployment info if any
+        if deployments:
+            w(f"\n\n## 🚀 Recent Deployments\n")
+            for deploy in islice(deployments, 3):
+                timestamp = deploy.get("startTime", 0)
+                if timestamp:
+                    deploy_time = _fmt_ts_minute(timestamp - timestamp % 60000)
+                else:
+                    deploy_time = "Unknown"
+                w(f"\n• {deploy.get('title', 'Unknown')} ({deploy_time})")
+        
+        # AI analysis section heading; the caller appends the analysis
+        w(f"\n\n---\n")
+        w(f"\n## 🤖 AI-Powered Analysis\n")
+        
+        return buf.getvalue(), ai_prompt
     
     # =========================================================================
     # SKILL 3: Get Service Topology
@@ -261,13 +542,15 @@ Be specific and actionable. Reference the actual evidence provided."""
             Service topology map with dependencies
         """
         try:
-            # First, find the service by name
-            if service_name.startswith("SERVICE-"):
-                entity_selector = f'entityId("{service_name}")'
+            # First, find the service by name. A name resolved recently is
+            # looked up by its ID, skipping the name scan on Dynatrace's side.
+            service_ref = self._name_to_id.get(service_name, service_name)
+            if service_ref.startswith("SERVICE-"):
+                entity_selector = entity_id_selector(service_ref)
             else:
                 entity_selector = f'type("SERVICE"),entityName.contains("{service_name}")'
             
-            result = await self.dynatrace.get_entities(
+            result = await self._get_entities_cached(
                 entity_selector=entity_selector,
                 fields="+toRelationships,+fromRelationships,+properties",
             )
@@ -275,47 +558,50 @@ Be specific and actionable. Reference the actual evidence provided."""
             entities = result.get("entities", [])
             
             if not entities:
+                self._name_to_id.pop(service_name, None)  # Stale ID, if any
                 return f"❌ No service found matching '{service_name}'"
             
             service = entities[0]
             service_id = service.get("entityId", "")
             service_display_name = service.get("displayName", service_name)
+            if service_id:
+                self._name_to_id[service_name] = service_id
             
-            output = [
-                f"# 🌐 Service Topology: {service_display_name}",
-                f"\n**Entity ID:** `{service_id}`\n",
-            ]
+            buf = io.StringIO()
+            w = buf.write
+            w(f"# 🌐 Service Topology: {service_display_name}")
+            w(f"\n\n**Entity ID:** `{service_id}`\n")
             
             # Upstream (what calls this service)
             from_relationships = service.get("fromRelationships", {})
-            output.append("## ⬆️ Upstream (Callers)")
+            w("\n## ⬆️ Upstream (Callers)")
             
             callers = from_relationships.get("calls", [])
             if callers:
-                for caller in callers[:10]:
-                    output.append(f"  • {caller.get('type', 'Unknown')}: {caller.get('id', 'Unknown')}")
+                for caller in islice(callers, 10):
+                    w(f"\n  • {caller.get('type', 'Unknown')}: {caller.get('id', 'Unknown')}")
             else:
-                output.append("  No upstream callers detected")
+                w("\n  No upstream callers detected")
             
             # Downstream (what this service calls)
             to_relationships = service.get("toRelationships", {})
-            output.append("\n## ⬇️ Downstream (Dependencies)")
+            w("\n\n## ⬇️ Downstream (Dependencies)")
             
             dependencies = to_relationships.get("calls", [])
             if dependencies:
-                for dep in dependencies[:10]:
-                    output.append(f"  • {dep.get('type', 'Unknown')}: {dep.get('id', 'Unknown')}")
+                for dep in islice(dependencies, 10):
+                    w(f"\n  • {dep.get('type', 'Unknown')}: {dep.get('id', 'Unknown')}")
             else:
-                output.append("  No downstream dependencies detected")
+                w("\n  No downstream dependencies detected")
             
             # Host/Process relationships
             runs_on = to_relationships.get("runsOn", [])
             if runs_on:
-                output.append("\n## 🖥️ Infrastructure")
-                for host in runs_on[:5]:
-                    output.append(f"  • Runs on: {host.get('id', 'Unknown')}")
+                w("\n\n## 🖥️ Infrastructure")
+                for host in islice(runs_on, 5):
+                    w(f"\n  • Runs on: {host.get('id', 'Unknown')}")
             
-            return "\n".join(output)
+            return buf.getvalue()
             
         except Exception as e:
             return f"❌ Error getting topology: {str(e)}"
@@ -335,53 +621,77 @@ Be specific and actionable. Reference the actual evidence provided."""
             Health status with relevant metrics
         """
         try:
-            entity = await self.dynatrace.get_entity(entity_id)
+            # The open-problems lookup only needs the ID, so start it
+            # alongside the entity fetch instead of after the metrics.
+            problems_task = asyncio.create_task(self._get_problems_cached(
+                entity_selector=entity_id_selector(entity_id),
+                status="OPEN",
+                from_time="now-24h",
+            ))
+            try:
+                entity = await self.dynatrace.get_entity(entity_id)
+            except Exception:
+                problems_task.cancel()
+                raise
             
             entity_type = entity.get("type", "UNKNOWN")
             display_name = entity.get("displayName", entity_id)
             
-            output = [
-                f"# 🏥 Entity Health: {display_name}",
-                f"\n**Type:** {entity_type}",
-                f"**ID:** `{entity_id}`\n",
-            ]
+            buf = io.StringIO()
+            w = buf.write
+            w(f"# 🏥 Entity Health: {display_name}")
+            w(f"\n\n**Type:** {entity_type}")
+            w(f"\n**ID:** `{entity_id}`\n")
             
-            # Get relevant metrics based on entity type
+            # Get relevant metrics based on entity type, concurrently with
+            # the problems lookup. Either may fail without losing the other.
             if entity_type == "HOST":
-                metrics = await self.dynatrace.get_host_metrics(entity_id)
-                output.append("## 📊 Host Metrics (Last Hour)")
-                
-                # Format CPU
-                cpu_data = metrics.get("cpu_usage", {}).get("result", [])
-                if cpu_data:
-                    output.append(f"  • CPU Usage: Queried")
-                
-                # Format Memory
-                mem_data = metrics.get("memory_usage", {}).get("result", [])
-                if mem_data:
-                    output.append(f"  • Memory Usage: Queried")
-                    
+                metrics_fetch = self.dynatrace.get_host_metrics(entity_id)
             elif entity_type == "SERVICE":
-                metrics = await self.dynatrace.get_service_metrics(entity_id)
-                output.append("## 📊 Service Metrics (Last Hour)")
-                output.append("  • Response Time, Throughput, Error Rate: Queried")
+                metrics_fetch = self.dynatrace.get_service_metrics(entity_id)
+            else:
+                metrics_fetch = asyncio.sleep(0)  # No metrics for this type
             
-            # Check for open problems affecting this entity
-            problems_result = await self.dynatrace.get_problems(
-                entity_selector=f'entityId("{entity_id}")',
-                status="OPEN",
-                from_time="now-24h",
+            metrics, problems_result = await asyncio.gather(
+                metrics_fetch, problems_task, return_exceptions=True
             )
             
-            problems = problems_result.get("problems", [])
-            if problems:
-                output.append(f"\n## ⚠️ Open Problems ({len(problems)})")
-                for p in problems[:3]:
-                    output.append(f"  • {p.get('title', 'Unknown')}")
+            if entity_type == "HOST":
+                w("\n## 📊 Host Metrics (Last Hour)")
+                
+                if isinstance(metrics, Exception):
+                    w(f"\n  • Metrics unavailable: {str(metrics)}")
+                else:
+                    # Format CPU
+                    cpu_data = metrics.get("cpu_usage", {}).get("result", [])
+                    if cpu_data:
+                        w(f"\n  • CPU Usage: Queried")
+                    
+                    # Format Memory
+                    mem_data = metrics.get("memory_usage", {}).get("result", [])
+                    if mem_data:
+                        w(f"\n  • Memory Usage: Queried")
+                    
+            elif entity_type == "SERVICE":
+                w("\n## 📊 Service Metrics (Last Hour)")
+                if isinstance(metrics, Exception):
+                    w(f"\n  • Metrics unavailable: {str(metrics)}")
+                else:
+                    w("\n  • Response Time, Throughput, Error Rate: Queried")
+            
+            # Open problems affecting this entity
+            if isinstance(problems_result, Exception):
+                w(f"\n\n## ⚠️ Open Problems: unavailable ({str(problems_result)})")
             else:
-                output.append("\n## ✅ No Open Problems")
+                problems = problems_result.get("problems", [])
+                if problems:
+                    w(f"\n\n## ⚠️ Open Problems ({len(problems)})")
+                    for p in islice(problems, 3):
+                        w(f"\n  • {p.get('title', 'Unknown')}")
+                else:
+                    w("\n\n## ✅ No Open Problems")
             
-            return "\n".join(output)
+            return buf.getvalue()
             
         except Exception as e:
             return f"❌ Error getting entity health: {str(e)}"
@@ -403,9 +713,18 @@ Be specific and actionable. Reference the actual evidence provided."""
         Returns:
             JSON structure with incident details for ServiceNow
         """
+        return await self._collect(self.create_incident_summary_stream(problem_id))
+    
+    async def create_incident_summary_stream(self, problem_id: str) -> AsyncIterator[str]:
+        """
+        Streaming variant of create_incident_summary.
+        
+        Yields the headline fields first, then the AI summary as Gemini
+        generates it, then the structured JSON with the finished summary.
+        """
         try:
             # Get problem details
-            problem = await self.dynatrace.get_problem_details(problem_id)
+            problem = await self._get_problem_cached(problem_id)
             
             # Extract key information
             title = problem.get("title", "Unknown Problem")
@@ -429,29 +748,33 @@ Be specific and actionable. Reference the actual evidence provided."""
             
             # Root cause
             root_cause = problem.get("rootCauseEntity", {})
+            root_cause_ref = root_cause.get("entityId", {})
             root_cause_name = root_cause.get("name", "Unknown")
-            root_cause_type = root_cause.get("entityId", {}).get("type", "Unknown")
+            root_cause_type = root_cause_ref.get("type", "Unknown")
             
-            # Evidence
+            # Evidence, collecting the AI prompt's descriptions on the way
             evidence_details = problem.get("evidenceDetails", {})
-            evidence_list = [
-                {
+            evidence_list = []
+            descriptions = []
+            for idx, e in enumerate(islice(evidence_details.get("details", ()), 10)):
+                description = e.get("displayName")
+                evidence_list.append({
                     "type": e.get("evidenceType"),
-                    "description": e.get("displayName"),
+                    "description": description,
                     "isRootCause": e.get("rootCauseRelevant", False)
-                }
-                for e in evidence_details.get("details", [])[:10]
-            ]
+                })
+                if idx < 5 and description:
+                    descriptions.append(description)
             
             # Affected entities
-            affected = [
-                {
+            affected = []
+            for e in islice(problem.get("affectedEntities", ()), 20):
+                entity_ref = e.get("entityId", {})
+                affected.append({
                     "name": e.get("name"),
-                    "type": e.get("entityId", {}).get("type"),
-                    "id": e.get("entityId", {}).get("id")
-                }
-                for e in problem.get("affectedEntities", [])[:20]
-            ]
+                    "type": entity_ref.get("type"),
+                    "id": entity_ref.get("id")
+                })
             
             # Build ServiceNow-friendly structure
             incident_data = {
@@ -466,44 +789,39 @@ Be specific and actionable. Reference the actual evidence provided."""
                 "rootCause": {
                     "entity": root_cause_name,
                     "entityType": root_cause_type,
-                    "entityId": root_cause.get("entityId", {}).get("id")
+                    "entityId": root_cause_ref.get("id")
                 },
                 "evidence": evidence_list,
                 "affectedEntities": affected,
                 "dynatraceUrl": f"{self.dynatrace.base_url}/#problems/problemdetails;pid={problem_id}"
             }
             
-            # Add AI-generated summary
-            ai_prompt = f"""Summarize this IT incident in 2-3 sentences for a ServiceNow ticket:
-            
-Problem: {title}
-Severity: {severity}
-Root Cause Entity: {root_cause_name} ({root_cause_type})
-Evidence: {', '.join([e['description'] for e in evidence_list[:5] if e.get('description')])}
-
-Be concise and technical."""
-
-            ai_summary = await self._ai_analyze(ai_prompt)
-            incident_data["aiSummary"] = ai_summary
-            
-            # Format output
-            output = [
-                "# 📋 ServiceNow Incident Summary",
-                f"\n**Problem:** {title}",
-                f"**Severity:** {severity} | **Impact:** {impact_level}",
-                f"\n**Root Cause:** {root_cause_name} ({root_cause_type})",
-                f"\n**AI Summary:** {ai_summary}",
-                f"\n---\n",
-                "## 📦 Structured Data (JSON)\n",
-                "```json",
-                json.dumps(incident_data, indent=2),
-                "```"
-            ]
-            
-            return "\n".join(output)
-            
         except Exception as e:
-            return f"❌ Error creating incident summary: {str(e)}"
+            yield f"❌ Error creating incident summary: {str(e)}"
+            return
+        
+        yield "\n".join([
+            "# 📋 ServiceNow Incident Summary",
+            f"\n**Problem:** {title}",
+            f"**Severity:** {severity} | **Impact:** {impact_level}",
+            f"\n**Root Cause:** {root_cause_name} ({root_cause_type})",
+            "\n**AI Summary:** ",
+        ])
+        
+        # Add AI-generated summary
+        summary_parts = []
+        async for chunk in self._ai_analyze_stream(self._incident_summary_prompt(problem, descriptions)):
+            summary_parts.append(chunk)
+            yield chunk
+        incident_data["aiSummary"] = "".join(summary_parts)
+        
+        yield "\n" + "\n".join([
+            "\n---\n",
+            "## 📦 Structured Data (JSON)\n",
+            "```json",
+            _pretty_json(incident_data),
+            "```"
+        ])
     
     # =========================================================================
     # SKILL 6: Natural Language Query
@@ -521,54 +839,80 @@ Be concise and technical."""
         """
         try:
             # Determine what data we need based on the question
-            question_lower = question.lower()
-            
-            context_data = {}
-            
-            # Fetch relevant data based on question keywords
-            if any(word in question_lower for word in ["problem", "issue", "alert", "incident"]):
-                problems_result = await self.dynatrace.get_problems(
+            tokens = set(_WORD_RE.findall(question.lower()))
+            
+            # Fetch relevant data based on question keywords. The fetches
+            # are independent, so they run concurrently; a failed fetch is
+            # reported in the context instead of failing the whole query.
+            fetches = {}
+            if tokens & self._PROBLEM_KEYWORDS:
+                fetches["open_problems"] = self._get_problems_cached(
                     status="OPEN",
                     from_time="now-24h"
                 )
+            
+            if tokens & self._SERVICE_KEYWORDS:
+                fetches["services"] = self._get_entities_cached(
+                    entity_selector='type("SERVICE")',
+                    from_time="now-2h"
+                )
+            
+            if tokens & self._HOST_KEYWORDS:
+                fetches["hosts"] = self._get_entities_cached(
+                    entity_selector='type("HOST")',
+                    from_time="now-2h"
+                )
+            
+            results = {}
+            if fetches:
+                results = dict(zip(
+                    fetches,
+                    await asyncio.gather(*fetches.values(), return_exceptions=True),
+                ))
+            
+            context_data = {}
+            for name, result in results.items():
+                if isinstance(result, Exception):
+                    logger.warning("query: fetching %s failed: %s", name, result)
+                    context_data[f"{name}_error"] = str(result)
+            if results and len(context_data) == len(results):
+                # Nothing fetched to answer from
+                first_error = next(iter(results.values()))
+                return f"❌ Error processing query: {str(first_error)}"
+            
+            problems_result = results.get("open_problems")
+            if isinstance(problems_result, dict):
                 context_data["open_problems"] = [
                     {
                         "title": p.get("title"),
                         "severity": p.get("severityLevel"),
                         "rootCause": p.get("rootCauseEntity", {}).get("name")
                     }
-                    for p in problems_result.get("problems", [])[:10]
+                    for p in islice(problems_result.get("problems", ()), 10)
                 ]
             
-            if any(word in question_lower for word in ["service", "application"]):
-                services_result = await self.dynatrace.get_entities(
-                    entity_selector='type("SERVICE")',
-                    from_time="now-2h"
-                )
+            services_result = results.get("services")
+            if isinstance(services_result, dict):
                 context_data["services"] = [
                     s.get("displayName") 
-                    for s in services_result.get("entities", [])[:20]
+                    for s in islice(services_result.get("entities", ()), 20)
                 ]
             
-            if any(word in question_lower for word in ["host", "server", "infrastructure"]):
-                hosts_result = await self.dynatrace.get_entities(
-                    entity_selector='type("HOST")',
-                    from_time="now-2h"
-                )
+            hosts_result = results.get("hosts")
+            if isinstance(hosts_result, dict):
                 context_data["hosts"] = [
                     h.get("displayName")
-                    for h in hosts_result.get("entities", [])[:20]
+                    for h in islice(hosts_result.get("entities", ()), 20)
                 ]
             
             # Generate AI response
-            ai_prompt = f"""You are a Dynatrace expert assistant. Answer the following question based on the environment data provided.
-
-**Question:** {question}
-
-**Available Environment Data:**
-{json.dumps(context_data, indent=2) if context_data else "No specific data fetched - provide general guidance."}
-
-Provide a helpful, specific answer. If the data doesn't contain enough information, explain what additional queries might help."""
+            if context_data:
+                ai_prompt = _QUERY_PROMPT.format(
+                    question=question,
+                    context=_pretty_json(context_data),
+                )
+            else:
+                ai_prompt = _GENERAL_PROMPT.format(question=question)
 
             response = await self._ai_analyze(ai_prompt)
             
@@ -7,10 +7,128 @@ This module provides methods to:
 - Retrieve metrics data
 - Access root cause evidence
 """
-import os
-from datetime import datetime, timedelta
-from typing import Any
+import asyncio
+import importlib.util
+import logging
+import re
+import time
+from collections import deque
+from functools import lru_cache
+from itertools import islice
+from typing import Any, AsyncIterator, Awaitable, Callable
 import httpx
+from cachetools import TTLCache
+
+from settings import Settings, get_settings
+
+# orjson parses the (often large, number-heavy) API responses straight
+# from bytes, and serializes request bodies straight to bytes; the stdlib
+# fallback matches httpx's own compact, non-ASCII-escaping encoding
+try:
+    from orjson import dumps as _json_dumps, loads as _json_loads
+except ImportError:
+    import json
+    from json import loads as _json_loads
+    
+    def _json_dumps(obj: Any) -> bytes:
+        return json.dumps(obj, ensure_ascii=False, separators=(",", ":")).encode()
+
+logger = logging.getLogger(__name__)
+
+# ijson lets iter_problems parse problem lists while they download;
+# without it the list is fetched and parsed in one piece
+try:
+    import ijson
+except ImportError:
+    ijson = None
+
+# HTTP/2 needs the optional h2 package (httpx[http2]); fall back to
+# HTTP/1.1 keep-alive when it isn't installed
+_HTTP2_AVAILABLE = importlib.util.find_spec("h2") is not None
+
+# Responses that mean "slow down / try again": rate limited, bad gateway
+_RETRY_STATUSES = frozenset({429, 502})
+_MAX_RETRIES = 3
+_MAX_RETRY_DELAY = 60.0
+
+# Responses faster than this (seconds) count as headroom to raise concurrency
+_TARGET_LATENCY = 1.0
+
+# Entities and topology change slowly; reuse lookups for this many seconds
+_ENTITY_TTL = 60
+_TOPOLOGY_TTL = 30
+
+# Fields requested for single-entity lookups, and how many entity IDs
+# go into one entityId(...) selector
+_ENTITY_FIELDS = "+properties,+toRelationships,+fromRelationships,+tags"
+_ENTITY_BATCH_SIZE = 100
+
+
+@lru_cache(maxsize=2048)
+def entity_id_selector(entity_id: str) -> str:
+    """entityId("...") selector for one entity, built once per ID."""
+    return f'entityId("{entity_id}")'
+
+
+@lru_cache(maxsize=256)
+def entity_ids_selector(entity_ids: tuple[str, ...]) -> str:
+    """entityId("A","B",...) selector for several entities."""
+    return "entityId({})".format(",".join(f'"{i}"' for i in entity_ids))
+
+# Human-readable problem summary, filled by format_problem_summary
+_PROBLEM_TEMPLATE = """📋 **Problem: {title}**
+━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━
+• **Status:** {status}
+• **Severity:** {severity}
+• **Impact Level:** {impact}
+• **Started:** {started}
+• **Ended:** {ended}
+• **Root Cause Entity:** {root_cause}
+• **Affected Entities:** {affected}"""
+
+# The same template pre-encoded to UTF-8: the literal pieces between the
+# fields, and the field names in order, for format_problem_summary_bytes
+_PROBLEM_TEMPLATE_PARTS = tuple(
+    part.encode() for part in re.split(r"\{\w+\}", _PROBLEM_TEMPLATE)
+)
+_PROBLEM_TEMPLATE_FIELDS = tuple(re.findall(r"\{(\w+)\}", _PROBLEM_TEMPLATE))
+
+
+class _AIMDLimiter:
+    """
+    Concurrency limit that adapts like TCP congestion control.
+    
+    The limit grows by one after each fast, clean response (additive
+    increase) and halves when Dynatrace signals pressure (multiplicative
+    decrease), always staying between 1 and the configured cap.
+    """
+    
+    def __init__(self, cap: int):
+        self.cap = max(1, cap)
+        self.limit = self.cap
+        self._in_flight = 0
+        self._cond = asyncio.Condition()
+    
+    async def __aenter__(self) -> None:
+        async with self._cond:
+            await self._cond.wait_for(lambda: self._in_flight < self.limit)
+            self._in_flight += 1
+    
+    async def __aexit__(self, *exc_info) -> None:
+        async with self._cond:
+            self._in_flight -= 1
+            self._cond.notify()
+    
+    async def increase(self) -> None:
+        """Additive increase after a healthy response."""
+        if self.limit < self.cap:
+            async with self._cond:
+                self.limit += 1
+                self._cond.notify()
+    
+    def decrease(self) -> None:
+        """Multiplicative decrease on a rate-limit signal."""
+        self.limit = max(1, self.limit // 2)
 
 
 class DynatraceClient:
@@ -24,10 +142,16 @@ class DynatraceClient:
     - Events API v2 (Deployment, config changes)
     """
     
-    def __init__(self):
-        """Initialize the Dynatrace client with environment variables."""
-        self.base_url = os.getenv("DYNATRACE_URL", "").rstrip("/")
-        self.api_token = os.getenv("DYNATRACE_API_TOKEN", "")
+    def __init__(self, settings: Settings | None = None):
+        """
+        Initialize the Dynatrace client.
+        
+        Args:
+            settings: Configuration to use instead of the environment's
+        """
+        settings = settings or get_settings()
+        self.base_url = settings.dynatrace_url
+        self.api_token = settings.dynatrace_api_token
         
         if not self.base_url:
             raise ValueError("DYNATRACE_URL environment variable is required")
@@ -38,6 +162,42 @@ class DynatraceClient:
             "Authorization": f"Api-Token {self.api_token}",
             "Content-Type": "application/json",
         }
+        
+        # One pooled client for all requests, so connections (and their
+        # TLS sessions) are reused instead of re-established per call.
+        # Dynatrace SaaS speaks HTTP/2, which multiplexes the metric and
+        # topology fan-outs over a few connections; the transport also
+        # retries connection failures (not HTTP errors) twice.
+        self._client = httpx.AsyncClient(
+            base_url=f"{self.base_url}/api/v2/",
+            headers=self.headers,
+            timeout=30.0,
+            transport=httpx.AsyncHTTPTransport(
+                http2=_HTTP2_AVAILABLE,
+                retries=2,
+                limits=httpx.Limits(
+                    max_connections=64,
+                    max_keepalive_connections=32,
+                    keepalive_expiry=30.0,
+                ),
+            ),
+        )
+        self._http_version_logged = False
+        
+        # Client-side backpressure: an adaptive cap on concurrent requests,
+        # plus an optional requests-per-minute window (0 disables it)
+        self._limiter = _AIMDLimiter(settings.dynatrace_max_concurrency)
+        self._max_rpm = settings.dynatrace_max_rpm
+        self._request_times: deque[float] = deque()
+        
+        # Short-lived lookup caches, plus in-flight fetches by cache key
+        self._entity_cache = TTLCache(maxsize=512, ttl=_ENTITY_TTL)
+        self._topology_cache = TTLCache(maxsize=256, ttl=_TOPOLOGY_TTL)
+        self._inflight: dict[tuple, asyncio.Task] = {}
+    
+    async def aclose(self) -> None:
+        """Close the pooled HTTP connections."""
+        await self._client.aclose()
     
     async def _make_request(
         self, 
@@ -46,19 +206,153 @@ class DynatraceClient:
         params: dict | None = None,
         json_data: dict | None = None
     ) -> dict[str, Any]:
-        """Make an async HTTP request to Dynatrace API."""
-        url = f"{self.base_url}/api/v2/{endpoint}"
-        
-        async with httpx.AsyncClient(timeout=30.0) as client:
-            response = await client.request(
-                method=method,
-                url=url,
-                headers=self.headers,
-                params=params,
-                json=json_data,
+        """
+        Make an async HTTP request to Dynatrace API.
+        
+        Requests go through the adaptive concurrency limit and the RPM
+        window. 429 and 502 responses halve the concurrency limit and are
+        retried with exponential backoff, honoring Retry-After.
+        
+        Concurrent identical GETs share one request.
+        """
+        if method == "GET":
+            key = ("GET", endpoint, frozenset(params.items()) if params else None)
+            return await self._single_flight(
+                key, lambda: self._send(method, endpoint, params, json_data)
             )
+        return await self._send(method, endpoint, params, json_data)
+    
+    async def _send(
+        self,
+        method: str,
+        endpoint: str,
+        params: dict | None,
+        json_data: dict | None,
+    ) -> dict[str, Any]:
+        """_make_request without single-flight."""
+        # Serialized once for all attempts. self.headers already sets the
+        # application/json content type.
+        content = _json_dumps(json_data) if json_data is not None else None
+        for attempt in range(_MAX_RETRIES + 1):
+            await self._wait_if_throttled()
+            async with self._limiter:
+                started = time.monotonic()
+                response = await self._client.request(
+                    method=method,
+                    url=endpoint,
+                    params=params,
+                    content=content,
+                )
+                latency = time.monotonic() - started
+            
+            if not self._http_version_logged:
+                # Confirms whether HTTP/2 was negotiated or fell back
+                logger.debug("Dynatrace API connection uses %s", response.http_version)
+                self._http_version_logged = True
+            
+            if response.status_code in _RETRY_STATUSES:
+                self._limiter.decrease()
+                if attempt < _MAX_RETRIES:
+                    await asyncio.sleep(self._retry_delay(response, attempt))
+                    continue
+            else:
+                await self._observe_rate_limit(response, latency)
+            
             response.raise_for_status()
-            return response.json()
+            return _json_loads(response.content)
+    
+    async def _cached(
+        self,
+        cache: TTLCache,
+        key: tuple,
+        fetch: Callable[[], Awaitable[Any]],
+    ) -> Any:
+        """
+        Return cache[key], awaiting fetch() and storing its result on a miss.
+        
+        Concurrent misses for the same key share a single fetch.
+        """
+        try:
+            return cache[key]
+        except KeyError:
+            pass
+        
+        async def fetch_and_store() -> Any:
+            value = await fetch()
+            cache[key] = value
+            return value
+        
+        return await self._single_flight(key, fetch_and_store)
+    
+    async def _single_flight(
+        self,
+        key: tuple,
+        fetch: Callable[[], Awaitable[Any]],
+    ) -> Any:
+        """
+        Run fetch() at most once at a time per key.
+        
+        Concurrent callers with the same key await the call already in
+        flight instead of issuing a duplicate one.
+        """
+        task = self._inflight.get(key)
+        if task is None:
+            # Its own task, so the shared call outlives whichever caller
+            # started it: cancelling that caller leaves the others waiting
+            task = asyncio.ensure_future(fetch())
+            self._inflight[key] = task
+            task.add_done_callback(lambda done: self._finish_inflight(key, done))
+        # shield: a cancelled caller stops waiting without cancelling the call
+        return await asyncio.shield(task)
+    
+    def _finish_inflight(self, key: tuple, task: asyncio.Future) -> None:
+        """Done callback for a _single_flight call: forget it."""
+        if self._inflight.get(key) is task:
+            del self._inflight[key]
+        if not task.cancelled():
+            task.exception()  # Mark retrieved even if every caller gave up
+    
+    def _invalidate_entity(self, entity_id: str) -> None:
+        """Drop every cached lookup for an entity (e.g. after a 404)."""
+        for cache in (self._entity_cache, self._topology_cache):
+            for key in [k for k in cache if k[1] == entity_id]:
+                cache.pop(key, None)
+    
+    async def _wait_if_throttled(self) -> None:
+        """Block until a request fits in the requests-per-minute window."""
+        if self._max_rpm <= 0:
+            return
+        
+        while True:
+            now = time.monotonic()
+            while self._request_times and now - self._request_times[0] >= 60:
+                self._request_times.popleft()
+            if len(self._request_times) < self._max_rpm:
+                self._request_times.append(now)
+                return
+            await asyncio.sleep(60 - (now - self._request_times[0]))
+    
+    async def _observe_rate_limit(self, response: httpx.Response, latency: float) -> None:
+        """Adjust the concurrency limit from a non-retried response."""
+        try:
+            limit = int(response.headers["X-RateLimit-Limit"])
+            remaining = int(response.headers["X-RateLimit-Remaining"])
+        except (KeyError, ValueError):
+            limit = remaining = None
+        
+        if limit and remaining is not None and remaining < limit * 0.1:
+            self._limiter.decrease()
+        elif response.is_success and latency < _TARGET_LATENCY:
+            await self._limiter.increase()
+    
+    @staticmethod
+    def _retry_delay(response: httpx.Response, attempt: int) -> float:
+        """Seconds to wait before a retry: Retry-After, else exponential backoff."""
+        try:
+            delay = float(response.headers["Retry-After"])
+        except (KeyError, ValueError):
+            delay = 0.5 * 2 ** attempt
+        return min(max(delay, 0.0), _MAX_RETRY_DELAY)
     
     # =========================================================================
     # PROBLEMS API v2 - Davis AI Detected Issues
@@ -87,6 +381,81 @@ class DynatraceClient:
         Returns:
             Dict with 'problems' list and pagination info
         """
+        params = self._problems_params(
+            status, from_time, to_time, problem_selector, entity_selector, page_size
+        )
+        return await self._make_request("GET", "problems", params=params)
+    
+    async def iter_problems(
+        self,
+        status: str = "OPEN",
+        from_time: str = "now-24h",
+        to_time: str = "now",
+        problem_selector: str | None = None,
+        entity_selector: str | None = None,
+        page_size: int = 50,
+    ) -> AsyncIterator[dict[str, Any]]:
+        """
+        Yield problems one at a time as the response arrives.
+        
+        Same arguments as get_problems. Meant for consumers that handle
+        problems one by one over a large result (exports, bulk enrichment)
+        rather than the agent's skills, which share a cached get_problems
+        result. With ijson installed the body is parsed incrementally, so
+        callers can work on early problems while later ones are still
+        downloading, and can stop early. Otherwise (or when Dynatrace asks
+        us to back off) the problems come from a regular get_problems
+        request.
+        
+        Callers may make other client requests inside the loop: the
+        concurrency slot is only held while the request is sent.
+        """
+        params = self._problems_params(
+            status, from_time, to_time, problem_selector, entity_selector, page_size
+        )
+        
+        if ijson is not None:
+            await self._wait_if_throttled()
+            request = self._client.build_request("GET", "problems", params=params)
+            # The slot covers sending the request and reading the headers,
+            # not the yields below: the caller's own requests need slots
+            # too, and with the limit cut to 1 they would wait forever
+            async with self._limiter:
+                response = await self._client.send(request, stream=True)
+            try:
+                if response.status_code in _RETRY_STATUSES:
+                    self._limiter.decrease()
+                else:
+                    response.raise_for_status()
+                    problems = ijson.sendable_list()
+                    parser = ijson.items_coro(problems, "problems.item", use_float=True)
+                    async for chunk in response.aiter_bytes():
+                        parser.send(chunk)
+                        for problem in problems:
+                            yield problem
+                        del problems[:]
+                    parser.close()
+                    for problem in problems:
+                        yield problem
+                    return
+            finally:
+                await response.aclose()
+        
+        # No streaming parser, or a 429/502 to retry with backoff
+        result = await self._make_request("GET", "problems", params=params)
+        for problem in result.get("problems", ()):
+            yield problem
+    
+    @staticmethod
+    def _problems_params(
+        status: str,
+        from_time: str,
+        to_time: str,
+        problem_selector: str | None,
+        entity_selector: str | None,
+        page_size: int,
+    ) -> dict[str, Any]:
+        """Query parameters for the problems list endpoint."""
         params = {
             "from": from_time,
             "to": to_time,
@@ -104,7 +473,7 @@ class DynatraceClient:
         if entity_selector:
             params["entitySelector"] = entity_selector
         
-        return await self._make_request("GET", "problems", params=params)
+        return params
     
     async def get_problem_details(self, problem_id: str) -> dict[str, Any]:
         """
@@ -169,6 +538,9 @@ class DynatraceClient:
         """
         Get details of a specific entity including relationships.
         
+        Results are cached for a minute; a 404 drops any cached lookups
+        for the entity.
+        
         Args:
             entity_id: Entity ID (e.g., 'HOST-ABC123', 'SERVICE-XYZ789')
             from_time: Time range for relationship data
@@ -178,9 +550,18 @@ class DynatraceClient:
         """
         params = {
             "from": from_time,
-            "fields": "+properties,+toRelationships,+fromRelationships,+tags",
+            "fields": _ENTITY_FIELDS,
         }
-        return await self._make_request("GET", f"entities/{entity_id}", params=params)
+        try:
+            return await self._cached(
+                self._entity_cache,
+                ("entity", entity_id, from_time),
+                lambda: self._make_request("GET", f"entities/{entity_id}", params=params),
+            )
+        except httpx.HTTPStatusError as e:
+            if e.response.status_code == 404:
+                self._invalidate_entity(entity_id)
+            raise
     
     async def get_entity_topology(
         self,
@@ -195,11 +576,21 @@ class DynatraceClient:
         
         Args:
             entity_id: Starting entity ID
-            depth: How many relationship levels to traverse
+            depth: How many relationship levels to traverse. Above 1, the
+                details of each directly related entity are fetched too.
             
         Returns:
-            Entity with its relationships
+            Entity with its relationships (and, for depth > 1, a
+            'neighbors' map of related entity ID to entity details)
         """
+        return await self._cached(
+            self._topology_cache,
+            ("topology", entity_id, depth),
+            lambda: self._build_entity_topology(entity_id, depth),
+        )
+    
+    async def _build_entity_topology(self, entity_id: str, depth: int) -> dict[str, Any]:
+        """Fetch and assemble the topology returned by get_entity_topology."""
         # Get the entity with relationships
         entity = await self.get_entity(entity_id)
         
@@ -227,8 +618,60 @@ class DynatraceClient:
                         "entity": rel_entity,
                     })
         
+        if depth > 1:
+            neighbor_ids = list(dict.fromkeys(
+                rel["entity"].get("id")
+                for rel in topology["upstream"] + topology["downstream"]
+                if rel["entity"].get("id")
+            ))
+            topology["neighbors"] = await self._get_entities_by_id(neighbor_ids)
+        
         return topology
     
+    async def _get_entities_by_id(
+        self,
+        entity_ids: list[str],
+        from_time: str = "now-2h",
+    ) -> dict[str, dict[str, Any]]:
+        """
+        Fetch many entities with entityId("A","B",...) selectors.
+        
+        IDs go out in chunks of _ENTITY_BATCH_SIZE (to keep URLs short),
+        with the chunks requested concurrently. A chunk that fails is left
+        out rather than failing the whole lookup. Fetched entities also
+        warm the get_entity cache.
+        
+        Returns:
+            Entity details by entity ID
+        """
+        chunks = [
+            entity_ids[i:i + _ENTITY_BATCH_SIZE]
+            for i in range(0, len(entity_ids), _ENTITY_BATCH_SIZE)
+        ]
+        results = await asyncio.gather(
+            *(
+                self.get_entities(
+                    entity_selector=entity_ids_selector(tuple(chunk)),
+                    from_time=from_time,
+                    fields=_ENTITY_FIELDS,
+                    page_size=len(chunk),
+                )
+                for chunk in chunks
+            ),
+            return_exceptions=True,
+        )
+        
+        entities = {}
+        for result in results:
+            if isinstance(result, Exception):
+                continue
+            for entity in result.get("entities", ()):
+                entity_id = entity.get("entityId")
+                if entity_id:
+                    entities[entity_id] = entity
+                    self._entity_cache[("entity", entity_id, from_time)] = entity
+        return entities
+    
     # =========================================================================
     # METRICS API v2 - Performance Data
     # =========================================================================
@@ -281,33 +724,33 @@ class DynatraceClient:
         Returns:
             Dict with response time, throughput, error rate
         """
-        metrics = {}
-        
-        # Response time
-        response_time = await self.get_metrics(
-            metric_selector="builtin:service.response.time:avg",
-            entity_selector=f'entityId("{service_id}")',
-            from_time=from_time,
-        )
-        metrics["response_time"] = response_time
-        
-        # Throughput
-        throughput = await self.get_metrics(
-            metric_selector="builtin:service.requestCount.total:rate(1m)",
-            entity_selector=f'entityId("{service_id}")',
-            from_time=from_time,
-        )
-        metrics["throughput"] = throughput
-        
-        # Error rate
-        error_rate = await self.get_metrics(
-            metric_selector="builtin:service.errors.total.rate",
-            entity_selector=f'entityId("{service_id}")',
-            from_time=from_time,
+        # The three queries are independent, so run them concurrently
+        response_time, throughput, error_rate = await asyncio.gather(
+            # Response time
+            self.get_metrics(
+                metric_selector="builtin:service.response.time:avg",
+                entity_selector=entity_id_selector(service_id),
+                from_time=from_time,
+            ),
+            # Throughput
+            self.get_metrics(
+                metric_selector="builtin:service.requestCount.total:rate(1m)",
+                entity_selector=entity_id_selector(service_id),
+                from_time=from_time,
+            ),
+            # Error rate
+            self.get_metrics(
+                metric_selector="builtin:service.errors.total.rate",
+                entity_selector=entity_id_selector(service_id),
+                from_time=from_time,
+            ),
         )
-        metrics["error_rate"] = error_rate
         
-        return metrics
+        return {
+            "response_time": response_time,
+            "throughput": throughput,
+            "error_rate": error_rate,
+        }
     
     async def get_host_metrics(
         self,
@@ -324,25 +767,26 @@ class DynatraceClient:
         Returns:
             Dict with CPU, memory, disk metrics
         """
-        metrics = {}
-        
-        # CPU usage
-        cpu = await self.get_metrics(
-            metric_selector="builtin:host.cpu.usage:avg",
-            entity_selector=f'entityId("{host_id}")',
-            from_time=from_time,
+        # The queries are independent, so run them concurrently
+        cpu, memory = await asyncio.gather(
+            # CPU usage
+            self.get_metrics(
+                metric_selector="builtin:host.cpu.usage:avg",
+                entity_selector=entity_id_selector(host_id),
+                from_time=from_time,
+            ),
+            # Memory usage
+            self.get_metrics(
+                metric_selector="builtin:host.mem.usage:avg",
+                entity_selector=entity_id_selector(host_id),
+                from_time=from_time,
+            ),
         )
-        metrics["cpu_usage"] = cpu
         
-        # Memory usage
-        memory = await self.get_metrics(
-            metric_selector="builtin:host.mem.usage:avg",
-            entity_selector=f'entityId("{host_id}")',
-            from_time=from_time,
-        )
-        metrics["memory_usage"] = memory
-        
-        return metrics
+        return {
+            "cpu_usage": cpu,
+            "memory_usage": memory,
+        }
     
     # =========================================================================
     # EVENTS API v2 - Deployments, Configuration Changes
@@ -406,48 +850,67 @@ class DynatraceClient:
     # HELPER METHODS
     # =========================================================================
     
-    def format_problem_summary(self, problem: dict) -> str:
-        """Format a problem into a human-readable summary."""
-        title = problem.get("title", "Unknown Problem")
-        status = problem.get("status", "UNKNOWN")
-        severity = problem.get("severityLevel", "UNKNOWN")
-        impact = problem.get("impactLevel", "UNKNOWN")
-        
-        # Get affected entities
-        affected = problem.get("affectedEntities", [])
-        affected_names = [e.get("name", e.get("entityId", {}).get("id", "Unknown")) 
-                        for e in affected[:5]]
+    @staticmethod
+    def _fmt_ts(ts_ms: int) -> str:
+        """
+        Format epoch millis as local 'YYYY-MM-DD HH:MM:SS'.
         
-        # Get root cause entity
-        root_cause = problem.get("rootCauseEntity", {})
-        root_cause_name = root_cause.get("name", "Unknown")
+        Same output as datetime.fromtimestamp(...).strftime(), without
+        building a datetime or parsing a format string per call.
+        """
+        t = time.localtime(ts_ms // 1000)
+        return (
+            f"{t.tm_year:04d}-{t.tm_mon:02d}-{t.tm_mday:02d} "
+            f"{t.tm_hour:02d}:{t.tm_min:02d}:{t.tm_sec:02d}"
+        )
+    
+    def _problem_summary_fields(self, problem: dict) -> dict[str, str]:
+        """Values for the _PROBLEM_TEMPLATE fields."""
+        # Get affected entities. It's the template's last field, so trailing
+        # whitespace here would end up trailing the summary.
+        affected_names = ", ".join(
+            e.get("name", e.get("entityId", {}).get("id", "Unknown"))
+            for e in islice(problem.get("affectedEntities", ()), 5)
+        ).rstrip()
         
         # Start/end times
         start_time = problem.get("startTime", 0)
         end_time = problem.get("endTime", -1)
         
-        if start_time:
-            start_str = datetime.fromtimestamp(start_time / 1000).strftime("%Y-%m-%d %H:%M:%S")
-        else:
-            start_str = "Unknown"
-            
-        if end_time > 0:
-            end_str = datetime.fromtimestamp(end_time / 1000).strftime("%Y-%m-%d %H:%M:%S")
-        else:
-            end_str = "Ongoing"
+        return {
+            "title": problem.get("title", "Unknown Problem"),
+            "status": problem.get("status", "UNKNOWN"),
+            "severity": problem.get("severityLevel", "UNKNOWN"),
+            "impact": problem.get("impactLevel", "UNKNOWN"),
+            "started": self._fmt_ts(start_time) if start_time else "Unknown",
+            "ended": self._fmt_ts(end_time) if end_time > 0 else "Ongoing",
+            "root_cause": problem.get("rootCauseEntity", {}).get("name", "Unknown"),
+            "affected": affected_names,
+        }
+    
+    def format_problem_summary(self, problem: dict) -> str:
+        """Format a problem into a human-readable summary."""
+        # rstrip: with no affected entities the line ends in a bare space
+        return _PROBLEM_TEMPLATE.format_map(self._problem_summary_fields(problem)).rstrip()
+    
+    def format_problem_summary_bytes(self, problem: dict) -> bytes:
+        """
+        format_problem_summary, already UTF-8 encoded.
         
-        summary = f"""
-📋 **Problem: {title}**
-━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━
-• **Status:** {status}
-• **Severity:** {severity}
-• **Impact Level:** {impact}
-• **Started:** {start_str}
-• **Ended:** {end_str}
-• **Root Cause Entity:** {root_cause_name}
-• **Affected Entities:** {', '.join(affected_names)}
-"""
-        return summary.strip()
+        Only the field values are encoded per call; the template's literal
+        text (emoji, box drawing) was encoded once at import.
+        """
+        fields = self._problem_summary_fields(problem)
+        out = [_PROBLEM_TEMPLATE_PARTS[0]]
+        for name, part in zip(_PROBLEM_TEMPLATE_FIELDS, _PROBLEM_TEMPLATE_PARTS[1:]):
+            # str(): a JSON null field renders as "None", as format_map does
+            out.append(str(fields[name]).encode())
+            out.append(part)
+        return b"".join(out).rstrip()
+    
+    def format_problem_summaries(self, problems: list[dict]) -> str:
+        """Format several problems in one pass, separated by blank lines."""
+        return "\n\n".join(self.format_problem_summary(p) for p in problems)
     
     def format_evidence_summary(self, evidence_details: dict) -> str:
         """Format root cause evidence into readable text."""
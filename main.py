@@ -1,109 +1,137 @@
 """
 A2A Dynatrace Agent Server - Main Entry Point
 """
-import os
+import contextlib
+import hashlib
+import json
 import uvicorn
 from dotenv import load_dotenv
+from starlette.middleware import Middleware
+from starlette.middleware.gzip import GZipMiddleware
+from starlette.responses import JSONResponse, Response
+from starlette.routing import Route
+
+try:
+    import orjson
+except ImportError:  # Optional; the stdlib json module is used instead
+    orjson = None
 
 from a2a.server.apps import A2AStarletteApplication
 from a2a.server.request_handlers import DefaultRequestHandler
 from a2a.server.tasks import InMemoryTaskStore
 from a2a.types import AgentCapabilities, AgentCard, AgentSkill
+from a2a.utils.constants import AGENT_CARD_WELL_KNOWN_PATH, PREV_AGENT_CARD_WELL_KNOWN_PATH
 
 from agent_executor import DynatraceAgentExecutor
 from dynatrace_agent import DynatraceAgent
+from settings import get_settings
 
 load_dotenv()
 
 
+# =============================================================================
+# AGENT CARD - Skills and capabilities are static, so they are built once
+# at import; get_agent_card only fills in the URL
+# =============================================================================
+
+# Skill 1: Get Open Problems
+_GET_PROBLEMS_SKILL = AgentSkill(
+    id="get_problems",
+    name="Get Open Problems",
+    description="Retrieve open problems detected by Dynatrace Davis AI with severity and impact.",
+    tags=["problems", "alerts", "davis", "monitoring"],
+    examples=[
+        "Show open problems",
+        "List issues from the last 7 days",
+        "Any current alerts?",
+    ],
+)
+
+# Skill 2: Root Cause Analysis
+_ANALYZE_PROBLEM_SKILL = AgentSkill(
+    id="analyze_problem",
+    name="Root Cause Analysis",
+    description="Deep root cause analysis with evidence correlation, deployment checks, and AI recommendations.",
+    tags=["root-cause", "analysis", "troubleshooting", "davis"],
+    examples=[
+        "Analyze P-12345678",
+        "Root cause for P-87654321",
+        "Investigate problem P-11111111",
+    ],
+)
+
+# Skill 3: Service Topology
+_GET_TOPOLOGY_SKILL = AgentSkill(
+    id="get_topology",
+    name="Service Topology",
+    description="Get service dependencies and relationships from Smartscape topology.",
+    tags=["topology", "dependencies", "smartscape", "architecture"],
+    examples=[
+        "Topology for OrderService",
+        "Dependencies of payment-service",
+        "What does checkout-api call?",
+    ],
+)
+
+# Skill 4: Entity Health
+_GET_HEALTH_SKILL = AgentSkill(
+    id="get_health",
+    name="Entity Health Check",
+    description="Check health status and metrics for hosts, services, and processes.",
+    tags=["health", "metrics", "status", "monitoring"],
+    examples=[
+        "Health of HOST-ABC123",
+        "Status of SERVICE-XYZ789",
+        "Metrics for PROCESS-DEF456",
+    ],
+)
+
+# Skill 5: ServiceNow Integration
+_CREATE_INCIDENT_SKILL = AgentSkill(
+    id="create_incident",
+    name="ServiceNow Incident Summary",
+    description="Generate structured incident summary for ServiceNow integration with AI analysis.",
+    tags=["servicenow", "incident", "integration", "itsm"],
+    examples=[
+        "Create incident for P-12345678",
+        "ServiceNow summary P-87654321",
+    ],
+)
+
+# Skill 6: Natural Language Query
+_QUERY_SKILL = AgentSkill(
+    id="query",
+    name="Natural Language Query",
+    description="Answer natural language questions about the Dynatrace environment.",
+    tags=["query", "question", "natural-language", "ai"],
+    examples=[
+        "What services are affected by current issues?",
+        "Are there any database-related problems?",
+        "How many hosts are being monitored?",
+    ],
+)
+
+# Agent capabilities
+_CAPABILITIES = AgentCapabilities(
+    streaming=False,
+    pushNotifications=False,
+)
+
+_SKILLS = [
+    _GET_PROBLEMS_SKILL,
+    _ANALYZE_PROBLEM_SKILL,
+    _GET_TOPOLOGY_SKILL,
+    _GET_HEALTH_SKILL,
+    _CREATE_INCIDENT_SKILL,
+    _QUERY_SKILL,
+]
+
+
 def get_agent_card(host: str, port: int) -> AgentCard:
     """Create the Agent Card for the Dynatrace Agent."""
     
-    # Skill 1: Get Open Problems
-    get_problems_skill = AgentSkill(
-        id="get_problems",
-        name="Get Open Problems",
-        description="Retrieve open problems detected by Dynatrace Davis AI with severity and impact.",
-        tags=["problems", "alerts", "davis", "monitoring"],
-        examples=[
-            "Show open problems",
-            "List issues from the last 7 days",
-            "Any current alerts?",
-        ],
-    )
-    
-    # Skill 2: Root Cause Analysis
-    analyze_problem_skill = AgentSkill(
-        id="analyze_problem",
-        name="Root Cause Analysis",
-        description="Deep root cause analysis with evidence correlation, deployment checks, and AI recommendations.",
-        tags=["root-cause", "analysis", "troubleshooting", "davis"],
-        examples=[
-            "Analyze P-12345678",
-            "Root cause for P-87654321",
-            "Investigate problem P-11111111",
-        ],
-    )
-    
-    # Skill 3: Service Topology
-    get_topology_skill = AgentSkill(
-        id="get_topology",
-        name="Service Topology",
-        description="Get service dependencies and relationships from Smartscape topology.",
-        tags=["topology", "dependencies", "smartscape", "architecture"],
-        examples=[
-            "Topology for OrderService",
-            "Dependencies of payment-service",
-            "What does checkout-api call?",
-        ],
-    )
-    
-    # Skill 4: Entity Health
-    get_health_skill = AgentSkill(
-        id="get_health",
-        name="Entity Health Check",
-        description="Check health status and metrics for hosts, services, and processes.",
-        tags=["health", "metrics", "status", "monitoring"],
-        examples=[
-            "Health of HOST-ABC123",
-            "Status of SERVICE-XYZ789",
-            "Metrics for PROCESS-DEF456",
-        ],
-    )
-    
-    # Skill 5: ServiceNow Integration
-    create_incident_skill = AgentSkill(
-        id="create_incident",
-        name="ServiceNow Incident Summary",
-        description="Generate structured incident summary for ServiceNow integration with AI analysis.",
-        tags=["servicenow", "incident", "integration", "itsm"],
-        examples=[
-            "Create incident for P-12345678",
-            "ServiceNow summary P-87654321",
-        ],
-    )
-    
-    # Skill 6: Natural Language Query
-    query_skill = AgentSkill(
-        id="query",
-        name="Natural Language Query",
-        description="Answer natural language questions about the Dynatrace environment.",
-        tags=["query", "question", "natural-language", "ai"],
-        examples=[
-            "What services are affected by current issues?",
-            "Are there any database-related problems?",
-            "How many hosts are being monitored?",
-        ],
-    )
-    
-    # Agent capabilities
-    capabilities = AgentCapabilities(
-        streaming=False,
-        pushNotifications=False,
-    )
-    
     # Determine URL
-    host_url = os.getenv("HOST_URL")
+    host_url = get_settings().host_url
     if host_url:
         url = host_url.rstrip("/") + "/"
     else:
@@ -119,24 +147,66 @@ def get_agent_card(host: str, port: int) -> AgentCard:
         version="1.0.0",
         defaultInputModes=DynatraceAgent.SUPPORTED_CONTENT_TYPES,
         defaultOutputModes=DynatraceAgent.SUPPORTED_CONTENT_TYPES,
-        capabilities=capabilities,
-        skills=[
-            get_problems_skill,
-            analyze_problem_skill,
-            get_topology_skill,
-            get_health_skill,
-            create_incident_skill,
-            query_skill,
-        ],
+        capabilities=_CAPABILITIES,
+        skills=_SKILLS,
     )
     
     return agent_card
 
 
+def agent_card_routes(agent_card: AgentCard) -> list[Route]:
+    """
+    Routes serving the agent card from bytes serialized once at startup.
+    
+    The card is static, so this skips the per-request model_dump and JSON
+    encoding of the SDK's own handler. Covers the current well-known path
+    and the older agent.json one. Responses carry an ETag, so clients
+    that kept a copy revalidate it with If-None-Match and get a bodiless
+    304 while the card is unchanged.
+    """
+    card = agent_card.model_dump(mode="json", exclude_none=True, by_alias=True)
+    if orjson is not None:
+        card_bytes = orjson.dumps(card)
+    else:
+        card_bytes = json.dumps(card, separators=(",", ":")).encode()
+    
+    # Weak, since GZipMiddleware may send the card gzipped: the two
+    # encodings differ byte for byte but carry the same card. If-None-Match
+    # uses weak comparison, so the tag matches with or without W/.
+    opaque_tag = f'"{hashlib.blake2b(card_bytes, digest_size=16).hexdigest()}"'
+    # no-cache: clients may store the card but must revalidate it
+    headers = {"ETag": f"W/{opaque_tag}", "Cache-Control": "no-cache"}
+    
+    async def get_agent_card(request):
+        if_none_match = request.headers.get("if-none-match", "")
+        if opaque_tag in if_none_match or if_none_match.strip() == "*":
+            return Response(status_code=304, headers=headers)
+        return Response(card_bytes, media_type="application/json", headers=headers)
+    
+    return [
+        Route(path, get_agent_card, methods=["GET"])
+        for path in (AGENT_CARD_WELL_KNOWN_PATH, PREV_AGENT_CARD_WELL_KNOWN_PATH)
+    ]
+
+
+def intent_counts_route(agent_executor: DynatraceAgentExecutor) -> Route:
+    """
+    Route reporting how often each skill has been selected since startup.
+    
+    The counts, most frequent first, are what the intent table's order
+    should be tuned against (see agent_executor._INTENTS).
+    """
+    async def get_intent_counts(request):
+        return JSONResponse(dict(agent_executor.intent_counts.most_common()))
+    
+    return Route("/metrics/intents", get_intent_counts, methods=["GET"])
+
+
 def create_app(host: str = "0.0.0.0", port: int = 8000):
     """Create and configure the A2A Starlette application."""
     
     agent_executor = DynatraceAgentExecutor()
+    agent_card = get_agent_card(host, port)
     
     request_handler = DefaultRequestHandler(
         agent_executor=agent_executor,
@@ -144,11 +214,25 @@ def create_app(host: str = "0.0.0.0", port: int = 8000):
     )
     
     app = A2AStarletteApplication(
-        agent_card=get_agent_card(host, port),
+        agent_card=agent_card,
         http_handler=request_handler,
     )
     
-    return app.build()
+    @contextlib.asynccontextmanager
+    async def lifespan(_app):
+        yield
+        # Close pooled Dynatrace connections on shutdown
+        await agent_executor.agent.aclose()
+    
+    # Routes passed here are matched before the SDK's own, so the
+    # pre-serialized card takes over the agent card endpoints. Responses
+    # over 1 KB (long analyses) are gzipped for clients that accept it;
+    # the middleware leaves text/event-stream responses alone.
+    return app.build(
+        routes=[*agent_card_routes(agent_card), intent_counts_route(agent_executor)],
+        lifespan=lifespan,
+        middleware=[Middleware(GZipMiddleware, minimum_size=1000)],
+    )
 
 
 def validate_environment():
@@ -159,9 +243,10 @@ def validate_environment():
         ("GEMINI_API_KEY", "Google Gemini API key"),
     ]
     
+    settings = get_settings()
     missing = []
     for var, description in required_vars:
-        if not os.getenv(var):
+        if not getattr(settings, var.lower()):
             missing.append(f"  - {var}: {description}")
     
     if missing:
@@ -182,7 +267,7 @@ def main():
     parser.add_argument(
         "--port", 
         type=int, 
-        default=int(os.getenv("PORT", 8000)),
+        default=get_settings().port,
         help="Port to listen on"
     )
     
@@ -193,7 +278,7 @@ def main():
         exit(1)
     
     # Print startup info
-    dynatrace_url = os.getenv("DYNATRACE_URL", "").rstrip("/")
+    dynatrace_url = get_settings().dynatrace_url
     
     print("=" * 60)
     print("🔷 Dynatrace A2A Agent")
@@ -206,7 +291,16 @@ def main():
     
     # Create and run app
     app = create_app(args.host, args.port)
-    uvicorn.run(app, host=args.host, port=args.port)
+    uvicorn.run(
+        app,
+        host=args.host,
+        port=args.port,
+        # "auto" picks uvloop and httptools when installed (uvicorn[standard])
+        # and falls back to asyncio/h11 where they aren't, e.g. on Windows
+        loop="auto",
+        http="auto",
+        access_log=get_settings().access_log,
+    )
 
 
 if __name__ == "__main__":
@@ -0,0 +1,57 @@
+"""
+Settings - Environment configuration for the Dynatrace A2A Agent
+
+Environment variables are read once, into a frozen Settings instance
+shared by the server, the agent and the Dynatrace client.
+"""
+import functools
+import os
+from dataclasses import dataclass
+
+
+@dataclass(frozen=True)
+class Settings:
+    """Validated environment configuration."""
+    
+    # Required
+    dynatrace_url: str = ""
+    dynatrace_api_token: str = ""
+    gemini_api_key: str = ""
+    
+    # Server
+    host_url: str | None = None
+    port: int = 8000
+    access_log: bool = False
+    
+    # Caching and backpressure
+    dynatrace_cache_ttl: float = 15.0
+    gemini_cache_ttl: float = 300.0
+    dynatrace_max_concurrency: int = 10
+    dynatrace_max_rpm: int = 0
+    
+    @classmethod
+    def from_env(cls) -> "Settings":
+        """Read and convert settings from environment variables."""
+        env = os.environ
+        return cls(
+            dynatrace_url=env.get("DYNATRACE_URL", "").rstrip("/"),
+            dynatrace_api_token=env.get("DYNATRACE_API_TOKEN", ""),
+            gemini_api_key=env.get("GEMINI_API_KEY", ""),
+            host_url=env.get("HOST_URL") or None,
+            port=int(env.get("PORT", "8000")),
+            access_log=env.get("ACCESS_LOG", "false").lower() in ("1", "true", "yes"),
+            dynatrace_cache_ttl=float(env.get("DYNATRACE_CACHE_TTL_SECONDS", "15")),
+            gemini_cache_ttl=float(env.get("GEMINI_CACHE_TTL_SECONDS", "300")),
+            dynatrace_max_concurrency=int(env.get("DYNATRACE_MAX_CONCURRENCY", "10")),
+            dynatrace_max_rpm=int(env.get("DYNATRACE_MAX_RPM", "0")),
+        )
+
+
+@functools.lru_cache(maxsize=1)
+def get_settings() -> Settings:
+    """
+    Settings from the environment, read on first call and then reused.
+    
+    Call after load_dotenv() so values from .env are included.
+    """
+    return Settings.from_env()
@@ -2,45 +2,310 @@
 Test Client for the A2A Dynatrace Agent
 
 Usage:
-    python test_client.py [--url http://localhost:8000]
+    python test_client.py [--url http://localhost:8000] [--batch | --interactive]
 """
 import argparse
+import asyncio
+import atexit
+import contextlib
+import importlib.util
 import json
+import os
+import re
+import sys
+import threading
+import time
 import httpx
 import uuid
+from itertools import chain
+from pathlib import Path
 
+try:
+    import orjson
+except ImportError:  # Optional; the stdlib json module is used instead
+    orjson = None
 
-def get_agent_card(base_url: str) -> dict:
-    """Fetch the agent card from the server."""
-    url = f"{base_url}/.well-known/agent.json"
-    response = httpx.get(url, timeout=10.0)
-    response.raise_for_status()
-    return response.json()
+# ijson lets send_message_text parse responses while they download;
+# without it the response is parsed in one piece
+try:
+    import ijson
+except ImportError:
+    ijson = None
 
+# HTTP/2 lets the concurrent test messages share one connection as
+# separate streams; it needs the h2 package (httpx[http2])
+HTTP2_AVAILABLE = importlib.util.find_spec("h2") is not None
 
-def send_message(base_url: str, message: str) -> dict:
-    """Send a message to the A2A agent."""
-    request_body = {
-        "jsonrpc": "2.0",
-        "id": str(uuid.uuid4()),
-        "method": "message/send",
-        "params": {
-            "message": {
-                "role": "user",
-                "parts": [{"kind": "text", "text": message}],
-                "messageId": str(uuid.uuid4()),
-            }
+
+def accept_encoding() -> str:
+    """
+    Response encodings to ask for, best first.
+    
+    zstd and br are only offered when httpx can decode them, i.e. when
+    httpx[zstd] / httpx[brotli] is installed.
+    """
+    encodings = []
+    if importlib.util.find_spec("zstandard"):
+        encodings.append("zstd")
+    if importlib.util.find_spec("brotli") or importlib.util.find_spec("brotlicffi"):
+        encodings.append("br")
+    encodings.append("gzip")
+    return ", ".join(encodings)
+
+
+ACCEPT_ENCODING = accept_encoding()
+
+# The agent card from the last run, with the validators needed to
+# revalidate it instead of downloading it again
+CARD_CACHE_PATH = Path.home() / ".cache" / "a2a_client" / "agent_card.json"
+
+
+def new_client(base_url: str) -> httpx.AsyncClient:
+    """Pooled client for the agent at base_url."""
+    return httpx.AsyncClient(
+        base_url=base_url,
+        http2=HTTP2_AVAILABLE,
+        timeout=30.0,
+        limits=httpx.Limits(max_keepalive_connections=20, max_connections=100),
+        headers={"Content-Type": "application/json", "Accept-Encoding": ACCEPT_ENCODING},
+    )
+
+
+# Shared clients by base URL, for scripts that import the helpers below
+_clients: dict[str, httpx.AsyncClient] = {}
+
+
+def get_client(base_url: str) -> httpx.AsyncClient:
+    """
+    Shared client for base_url, created on first use.
+    
+    Callers that pass it to get_agent_card / send_message reuse one
+    connection pool across calls. Like any AsyncClient, it must stay on
+    the event loop it was first used on; close it there with
+    aclose_clients().
+    """
+    client = _clients.get(base_url)
+    if client is None:
+        client = _clients[base_url] = new_client(base_url)
+    return client
+
+
+async def aclose_clients():
+    """Close the shared clients; await this on the loop that used them."""
+    clients = list(_clients.values())
+    _clients.clear()
+    await asyncio.gather(*(client.aclose() for client in clients), return_exceptions=True)
+
+
+@atexit.register
+def close_clients():
+    """
+    Best-effort cleanup at interpreter exit for clients never closed.
+    
+    Their own loop is gone by then, so closing them on a new one may fail;
+    any error is ignored, since the process is exiting anyway. Callers
+    should await aclose_clients() themselves.
+    """
+    if _clients:
+        with contextlib.suppress(Exception):
+            asyncio.run(aclose_clients())
+
+
+def load_cached_card(base_url: str) -> dict | None:
+    """Cached agent card entry for base_url, if there is one."""
+    try:
+        cached = load_json(CARD_CACHE_PATH.read_bytes())
+    except (OSError, ValueError):
+        return None
+    return cached if cached.get("url") == base_url else None
+
+
+def save_cached_card(entry: dict):
+    """Store an agent card entry; caching is best effort."""
+    try:
+        CARD_CACHE_PATH.parent.mkdir(parents=True, exist_ok=True)
+        CARD_CACHE_PATH.write_bytes(dump_json(entry))
+    except OSError:
+        pass
+
+
+def card_expiry(headers: httpx.Headers) -> float:
+    """Time until which a response may be reused without asking the server."""
+    cache_control = headers.get("cache-control", "")
+    max_age = re.search(r"max-age=(\d+)", cache_control)
+    if not max_age or "no-cache" in cache_control or "no-store" in cache_control:
+        return 0.0
+    return time.time() + int(max_age.group(1))
+
+
+# message/send request envelope; build_message_request fills in the IDs
+# and text without rebuilding the fixed parts
+MESSAGE_REQUEST_TEMPLATE = {
+    "jsonrpc": "2.0",
+    "id": None,
+    "method": "message/send",
+    "params": {
+        "message": {
+            "role": "user",
+            "parts": None,
+            "messageId": None,
         }
     }
+}
+
+
+def dump_json(obj) -> bytes:
+    """Serialize a request body to compact JSON bytes."""
+    if orjson is not None:
+        return orjson.dumps(obj)
+    return json.dumps(obj, ensure_ascii=False, separators=(",", ":")).encode()
+
+
+def load_json(data: bytes):
+    """Parse a JSON response body straight from bytes."""
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
+
+
+async def get_agent_card(client: httpx.AsyncClient) -> dict:
+    """
+    Fetch the agent card from the server.
     
-    response = httpx.post(
-        base_url,
-        json=request_body,
-        headers={"Content-Type": "application/json"},
-        timeout=60.0
-    )
+    The card is cached on disk between runs. A copy still within its
+    Cache-Control max-age is used as is; otherwise it is revalidated with
+    If-None-Match / If-Modified-Since, and a 304 reuses the cached body.
+    """
+    base_url = str(client.base_url)
+    cached = load_cached_card(base_url)
+    if cached and cached.get("expires", 0) > time.time():
+        return cached["body"]
+    
+    headers = {}
+    if cached and cached.get("etag"):
+        headers["If-None-Match"] = cached["etag"]
+    if cached and cached.get("last_modified"):
+        headers["If-Modified-Since"] = cached["last_modified"]
+    
+    response = await client.get("/.well-known/agent.json", headers=headers, timeout=10.0)
+    if response.status_code == 304 and cached:
+        body = cached["body"]
+    else:
+        response.raise_for_status()
+        body = load_json(response.content)
+    
+    save_cached_card({
+        "url": base_url,
+        "etag": response.headers.get("etag", cached and cached.get("etag")),
+        "last_modified": response.headers.get(
+            "last-modified", cached and cached.get("last_modified")
+        ),
+        "expires": card_expiry(response.headers),
+        "body": body,
+    })
+    return body
+
+
+def new_ids(count: int) -> list[str]:
+    """count random (version 4) UUIDs as hex, from a single entropy read."""
+    entropy = os.urandom(16 * count)
+    return [
+        uuid.UUID(bytes=entropy[i:i + 16], version=4).hex
+        for i in range(0, len(entropy), 16)
+    ]
+
+
+def build_message_request(
+    message: str,
+    request_id: str | None = None,
+    message_id: str | None = None,
+) -> dict:
+    """Build the JSON-RPC message/send request for a message."""
+    request = MESSAGE_REQUEST_TEMPLATE | {"id": request_id or uuid.uuid4().hex}
+    request["params"] = {
+        "message": MESSAGE_REQUEST_TEMPLATE["params"]["message"] | {
+            "parts": [{"kind": "text", "text": message}],
+            "messageId": message_id or uuid.uuid4().hex,
+        }
+    }
+    return request
+
+
+async def send_message(client: httpx.AsyncClient, message: str) -> dict:
+    """Send a message to the A2A agent."""
+    request_body = build_message_request(message)
+    response = await client.post("", content=dump_json(request_body), timeout=60.0)
     response.raise_for_status()
-    return response.json()
+    return load_json(response.content)
+
+
+async def send_message_text(client: httpx.AsyncClient, message: str) -> str:
+    """
+    Send a message to the A2A agent and return its response text.
+    
+    The agent answers message/send with a Message, whose text is in its
+    top-level parts. With ijson installed those parts are parsed as the
+    response streams in, and reading stops at the first text part. Other
+    result shapes (e.g. a Task) are parsed in full by extract_response_text.
+    """
+    if ijson is None:
+        return extract_response_text(await send_message(client, message))
+    
+    request_body = dump_json(build_message_request(message))
+    async with client.stream("POST", "", content=request_body, timeout=60.0) as response:
+        response.raise_for_status()
+        parts = ijson.sendable_list()
+        parser = ijson.items_coro(parts, "result.parts.item")
+        chunks = []
+        async for chunk in response.aiter_bytes():
+            chunks.append(chunk)
+            parser.send(chunk)
+            for part in parts:
+                if part.get("kind") == "text":
+                    return part.get("text", "")
+            del parts[:]
+    
+    return extract_response_text(load_json(b"".join(chunks)))
+
+
+# Servers that answered a batch with a single error object; later batches
+# to them go straight to individual requests
+_batch_unsupported: set[str] = set()
+
+
+async def send_batch(client: httpx.AsyncClient, messages: list[str]) -> list[dict | Exception]:
+    """
+    Send messages as a single JSON-RPC 2.0 batch request.
+    
+    Batch responses may come back in any order, so they are matched to
+    their messages by request ID. A server without batch support answers
+    the array with a single error object; the messages are then sent
+    individually instead, and so is every later batch to that server.
+    """
+    server = str(client.base_url)
+    results = None
+    if server not in _batch_unsupported:
+        ids = new_ids(2 * len(messages))
+        request_bodies = [
+            build_message_request(message, ids[2 * i], ids[2 * i + 1])
+            for i, message in enumerate(messages)
+        ]
+        response = await client.post("", content=dump_json(request_bodies), timeout=60.0)
+        response.raise_for_status()
+        results = load_json(response.content)
+    
+    if not isinstance(results, list):
+        _batch_unsupported.add(server)
+        return await asyncio.gather(
+            *(send_message(client, message) for message in messages),
+            return_exceptions=True,
+        )
+    
+    by_id = {result.get("id"): result for result in results}
+    return [
+        by_id.get(body["id"]) or ValueError(f"No response for request {body['id']}")
+        for body in request_bodies
+    ]
 
 
 def extract_response_text(response: dict) -> str:
@@ -48,32 +313,119 @@ def extract_response_text(response: dict) -> str:
     try:
         result = response.get("result", {})
         
-        if "messages" in result:
-            messages = result["messages"]
-            if messages:
-                last_message = messages[-1]
-                parts = last_message.get("parts", [])
-                for part in parts:
-                    if part.get("kind") == "text":
-                        return part.get("text", "")
-        
-        if "artifacts" in result:
-            artifacts = result["artifacts"]
-            if artifacts:
-                for artifact in artifacts:
-                    parts = artifact.get("parts", [])
-                    for part in parts:
-                        if part.get("kind") == "text":
-                            return part.get("text", "")
+        # A Message result's own parts, then the last message's, then
+        # each artifact's in order
+        messages = result.get("messages")
+        containers = chain(
+            (result,) if "parts" in result else (),
+            messages[-1:] if messages else (),
+            result.get("artifacts") or (),
+        )
+        for container in containers:
+            for part in container.get("parts", ()):
+                if part.get("kind") == "text":
+                    return part.get("text", "")
         
-        return json.dumps(result, indent=2)
+        if orjson is not None:
+            return orjson.dumps(result, option=orjson.OPT_INDENT_2).decode()
+        return json.dumps(result, indent=2, ensure_ascii=False)
     except Exception as e:
         return f"Error parsing response: {e}"
 
 
-def main():
+def format_test_result(test_name: str, message: str, text: str | Exception) -> str:
+    """The printed report for one test message, as a single string."""
+    if isinstance(text, Exception):
+        result = f"❌ Error: {text}"
+    elif len(text) > 500:
+        result = f"📥 Response (truncated):\n{text[:500]}..."
+    else:
+        result = f"📥 Response:\n{text}"
+    return (
+        f"\n{'='*70}\n"
+        f"📤 Test: {test_name}\n"
+        f"   Message: '{message or '(empty)'}'\n"
+        f"{'-' * 70}\n"
+        f"{result}\n"
+    )
+
+
+async def read_line(prompt: str) -> str:
+    """
+    input() without blocking the event loop or interpreter exit.
+    
+    The read runs in a daemon thread rather than asyncio.to_thread: the
+    loop's executor is joined when asyncio.run finishes, which would wait
+    on a thread still blocked in input() until Enter is pressed. (See the
+    KeyboardInterrupt handling at the bottom for exiting past it.)
+    """
+    loop = asyncio.get_running_loop()
+    future = loop.create_future()
+    
+    def deliver(setter, value):
+        if not future.done():  # The waiter may have been cancelled
+            setter(value)
+    
+    def read():
+        try:
+            line = input(prompt)
+        except Exception as e:  # EOFError on end of input
+            callback = (future.set_exception, e)
+        else:
+            callback = (future.set_result, line)
+        with contextlib.suppress(RuntimeError):  # Loop already closed
+            loop.call_soon_threadsafe(deliver, *callback)
+    
+    threading.Thread(target=read, daemon=True).start()
+    return await future
+
+
+async def run_interactive(client: httpx.AsyncClient):
+    """
+    Read messages from stdin and send each to the agent until EOF or 'exit'.
+    
+    Every message goes over the same client and its kept-alive connections.
+    """
+    print("\n💬 Interactive mode - type a message, or 'exit' to quit")
+    while True:
+        try:
+            message = await read_line("\n> ")
+        except EOFError:
+            print()
+            return
+        
+        message = message.strip()
+        if message.lower() in ("exit", "quit"):
+            return
+        if not message:
+            continue
+        
+        try:
+            text = await send_message_text(client, message)
+        except Exception as e:
+            sys.stdout.write(f"❌ Error: {e}\n")
+        else:
+            sys.stdout.write(f"📥 Response:\n{text}\n")
+        sys.stdout.flush()
+
+
+async def main():
     parser = argparse.ArgumentParser(description="Test client for A2A Dynatrace Agent")
     parser.add_argument("--url", default="http://localhost:8000", help="Base URL")
+    mode = parser.add_mutually_exclusive_group()
+    mode.add_argument(
+        "--batch",
+        action="store_true",
+        help=(
+            "Send the test messages as one JSON-RPC batch request. The a2a-sdk "
+            "server rejects batches, so against it they are sent individually"
+        ),
+    )
+    mode.add_argument(
+        "--interactive",
+        action="store_true",
+        help="After fetching the agent card, read messages from stdin",
+    )
     args = parser.parse_args()
     
     base_url = args.url.rstrip("/")
@@ -82,45 +434,65 @@ def main():
     print("🔷 A2A Dynatrace Agent - Test Client")
     print("=" * 70)
     
-    # Fetch agent card
-    print("\n📇 Fetching Agent Card...")
-    try:
-        agent_card = get_agent_card(base_url)
-        print(f"   ✅ Name: {agent_card.get('name')}")
-        print(f"   ✅ Version: {agent_card.get('version')}")
-        print(f"   ✅ Skills: {len(agent_card.get('skills', []))}")
-        for skill in agent_card.get('skills', []):
-            print(f"      • {skill['name']}")
-    except Exception as e:
-        print(f"   ❌ Error: {e}")
-        return
-    
-    # Test messages
-    test_messages = [
-        ("Help", ""),
-        ("Get Problems", "Show open problems"),
-        ("Natural Language", "What is the current status of my environment?"),
-    ]
-    
-    for test_name, msg in test_messages:
-        print(f"\n{'='*70}")
-        print(f"📤 Test: {test_name}")
-        print(f"   Message: '{msg or '(empty)'}'")
-        print("-" * 70)
-        
+    # One pooled client for the card fetch and all test messages, so they
+    # share connections instead of each opening (and closing) its own
+    async with new_client(base_url) as client:
+        # Fetch agent card
+        print("\n📇 Fetching Agent Card...")
         try:
-            response = send_message(base_url, msg)
-            text = extract_response_text(response)
-            if len(text) > 500:
-                print(f"📥 Response (truncated):\n{text[:500]}...")
-            else:
-                print(f"📥 Response:\n{text}")
+            agent_card = await get_agent_card(client)
+            print(f"   ✅ Name: {agent_card.get('name')}")
+            print(f"   ✅ Version: {agent_card.get('version')}")
+            print(f"   ✅ Skills: {len(agent_card.get('skills', []))}")
+            for skill in agent_card.get('skills', []):
+                print(f"      • {skill['name']}")
         except Exception as e:
-            print(f"❌ Error: {e}")
+            print(f"   ❌ Error: {e}")
+            return
+        
+        if args.interactive:
+            await run_interactive(client)
+            return
+        
+        # Test messages
+        test_messages = [
+            ("Help", ""),
+            ("Get Problems", "Show open problems"),
+            ("Natural Language", "What is the current status of my environment?"),
+        ]
+        
+        # The messages are independent, so send them all at once (or in
+        # one batch request) and print the results in order
+        if args.batch:
+            try:
+                responses = await send_batch(client, [msg for _, msg in test_messages])
+            except Exception as e:
+                responses = [e] * len(test_messages)
+            texts = [
+                response if isinstance(response, Exception) else extract_response_text(response)
+                for response in responses
+            ]
+        else:
+            texts = await asyncio.gather(
+                *(send_message_text(client, msg) for _, msg in test_messages),
+                return_exceptions=True,
+            )
+        
+        # One write per test rather than a print() per line
+        for (test_name, msg), text in zip(test_messages, texts):
+            sys.stdout.write(format_test_result(test_name, msg, text))
+        sys.stdout.flush()
     
     print(f"\n{'='*70}")
     print("✅ Test complete!")
 
 
 if __name__ == "__main__":
-    main()
+    try:
+        asyncio.run(main())
+    except KeyboardInterrupt:
+        # Ctrl-C, e.g. at the interactive prompt. main() has already closed
+        # its client; exit without interpreter finalization, which would
+        # abort on read_line's daemon thread still holding stdin's lock.
+        print(flush=True)
+        os._exit(130)
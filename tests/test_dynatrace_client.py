@@ -0,0 +1,56 @@
+"""
+Tests for DynatraceClient, against an in-process mock of the Dynatrace API
+"""
+import asyncio
+import json
+import unittest
+
+import httpx
+
+from dynatrace_client import DynatraceClient
+from settings import Settings
+
+
+def _problems_api(request: httpx.Request) -> httpx.Response:
+    """Serve a two-problem list and per-problem details."""
+    if request.url.path == "/api/v2/problems":
+        problems = [{"problemId": "P-1"}, {"problemId": "P-2"}]
+        return httpx.Response(200, content=json.dumps({"problems": problems}).encode())
+    problem_id = request.url.path.rsplit("/", 1)[-1]
+    return httpx.Response(200, json={"problemId": problem_id, "title": f"Problem {problem_id}"})
+
+
+class IterProblemsTest(unittest.IsolatedAsyncioTestCase):
+    
+    async def asyncSetUp(self):
+        self.client = DynatraceClient(Settings(
+            dynatrace_url="https://dt.example.com",
+            dynatrace_api_token="token",
+        ))
+        await self.client.aclose()
+        self.client._client = httpx.AsyncClient(
+            base_url="https://dt.example.com/api/v2/",
+            transport=httpx.MockTransport(_problems_api),
+        )
+    
+    async def asyncTearDown(self):
+        await self.client.aclose()
+    
+    async def test_nested_request_with_limit_of_one(self):
+        # As after AIMD has halved the limit down to its floor
+        self.client._limiter.limit = 1
+        
+        async def enrich():
+            titles = []
+            async for problem in self.client.iter_problems():
+                details = await self.client.get_problem_details(problem["problemId"])
+                titles.append(details["title"])
+            return titles
+        
+        titles = await asyncio.wait_for(enrich(), timeout=5)
+        self.assertEqual(titles, ["Problem P-1", "Problem P-2"])
+        self.assertEqual(self.client._limiter._in_flight, 0)
+
+
+if __name__ == "__main__":
+    unittest.main()